@@ -0,0 +1,177 @@
+"""
+Benchmarks for the alternative algorithms in util.math
+
+- Every group of variants is run over the same inputs for a sweep of bit sizes.
+- Reports ops/sec and p50/p90/p99 latency per call, and flags the bit sizes where
+  the fastest variant of a group changes (crossover points). Variants capped by MAX_BITS
+  are listed separately and left out of the crossovers above their cap.
+- Results can be written as JSON to compare runs across commits.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_math
+    python -m benchmarks.bench_math --group primality --bits 16 32 64 --output bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from util.math import *
+
+# Largest bit size each variant is run at, the trial division tests are exponential in the bit size
+MAX_BITS = {
+    'q1_isprime': 20,
+    'q2_isprime': 40,
+}
+
+GROUPS = {
+    'gcd': [gcd, gcd_recursive],
+    'extended_gcd': [extended_gcd, extended_gcd_recursive],
+    'primality': [q1_isprime, q2_isprime, miller_rabin_test, is_prime],
+}
+
+# Printed with the group's results and stored in the report
+NOTES = {
+    'gcd': "gcd_recursive takes one step and then calls the iterative gcd, so this group does not compare a "
+           "recursive Euclidean algorithm with the iterative one, the two only differ by one call",
+}
+
+DEFAULT_BITS = [8, 16, 20, 24, 32, 40, 64, 128, 256, 512, 1024]
+
+
+def gen_inputs(group: str, bits: int, count: int, rng: random.Random) -> list:
+    """
+    - Argument tuples shared by all variants of a group
+    - Primality inputs are half primes (the worst case for trial division) and half random odd numbers
+    """
+    if group == 'primality':
+        inputs = []
+        for i in range(count):
+            n = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+            inputs.append((next_prime(n) if i % 2 == 0 else n,))
+        return inputs
+
+    return [(rng.getrandbits(bits) | (1 << (bits - 1)), rng.getrandbits(bits) | (1 << (bits - 1)))
+            for _ in range(count)]
+
+
+def percentile(samples: list, q: float) -> float:
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    k = max(0, min(len(samples) - 1, int(round(q / 100 * len(samples))) - 1))
+    return samples[k]
+
+
+def bench(fn, inputs: list, min_time: float) -> dict:
+    """
+    - Calls fn on every input, cycling through them until at least 'min_time' seconds have passed
+    - Each call is timed separately for the percentiles
+
+    :return: dict with ops/sec and latencies in microseconds
+    """
+    samples = []
+    total = 0
+    while total < min_time or len(samples) < len(inputs):
+        args = inputs[len(samples) % len(inputs)]
+        start = time.perf_counter_ns()
+        fn(*args)
+        elapsed = time.perf_counter_ns() - start
+        samples.append(elapsed)
+        total += elapsed / 1e9
+
+    samples.sort()
+    return {
+        'calls': len(samples),
+        'ops_per_sec': len(samples) / total if total else float('inf'),
+        'p50_us': percentile(samples, 50) / 1e3,
+        'p90_us': percentile(samples, 90) / 1e3,
+        'p99_us': percentile(samples, 99) / 1e3,
+    }
+
+
+def find_crossovers(results: dict) -> list:
+    """
+    Bit sizes at which the fastest variant of a group changes from the previous bit size
+    - Only the variants measured at both bit sizes are compared, so a variant that is capped by MAX_BITS does not
+      produce a crossover just because it was not run
+
+    :param results: {bits: {variant: stats}} for one group
+    :return: list of dicts (bits, from, to)
+    """
+    crossovers = []
+    sizes = sorted(results)
+    for previous, bits in zip(sizes, sizes[1:]):
+        common = [name for name in results[bits] if name in results[previous]]
+        if len(common) < 2:
+            continue
+        before = max(common, key=lambda name: results[previous][name]['ops_per_sec'])
+        after = max(common, key=lambda name: results[bits][name]['ops_per_sec'])
+        if before != after:
+            crossovers.append({'bits': bits, 'from': before, 'to': after})
+    return crossovers
+
+
+def run(groups: list, bit_sizes: list, count: int, min_time: float, seed: int) -> dict:
+    report = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': seed,
+        'groups': {},
+    }
+    for group in groups:
+        if group in NOTES:
+            print("%-14s note: %s" % (group, NOTES[group]))
+        results = {}
+        capped = {}
+        for bits in bit_sizes:
+            inputs = gen_inputs(group, bits, count, random.Random(seed + bits))
+            results[bits] = {}
+            for fn in GROUPS[group]:
+                if bits > MAX_BITS.get(fn.__name__, bits):
+                    capped.setdefault(fn.__name__, []).append(bits)
+                    continue
+                stats = bench(fn, inputs, min_time)
+                results[bits][fn.__name__] = stats
+                print("%-14s %5d bits  %-24s %12.0f ops/s  p50 %9.2f us  p90 %9.2f us  p99 %9.2f us"
+                      % (group, bits, fn.__name__, stats['ops_per_sec'],
+                         stats['p50_us'], stats['p90_us'], stats['p99_us']))
+
+        for name, sizes in capped.items():
+            print("%-14s %s not run above %d bits (skipped: %s)"
+                  % (group, name, MAX_BITS[name], ', '.join(map(str, sizes))))
+        crossovers = find_crossovers(results)
+        for c in crossovers:
+            print("%-14s crossover at %d bits: %s -> %s" % (group, c['bits'], c['from'], c['to']))
+        report['groups'][group] = {
+            'results': {str(bits): stats for bits, stats in results.items()},
+            'crossovers': crossovers,
+            'capped': capped,
+            'note': NOTES.get(group),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--group', nargs='+', choices=sorted(GROUPS), default=sorted(GROUPS))
+    parser.add_argument('--bits', nargs='+', type=int, default=DEFAULT_BITS)
+    parser.add_argument('--count', type=int, default=64, help="distinct inputs per bit size")
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds per variant and bit size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if min(args.bits) < 2:
+        parser.error("bit sizes must be at least 2")
+
+    report = run(args.group, args.bits, args.count, args.min_time, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import random
-from sympy.ntheory.primetest import isprime
-from util.math import mod_inverse
+import secrets
+from util.group import Group
+from util.math import batch_mod_inverse, fixed_base_pow, is_prime, mod_inverse
 
 
 class DSA:
@@ -16,14 +17,14 @@ class DSA:
         :param private_key: secret key
         :return:
         """
-        if not (isprime(p) and isprime(q)):
+        if not (is_prime(p) and is_prime(q)):
             raise ValueError("p & q must be prime.")
 
         if not ((p - 1) % q) == 0:
             raise ValueError("(p-1) must be divisible by q")
 
-        alpha = pow(g, int((p - 1) / q), p)
-        beta = pow(alpha, private_key, p)
+        alpha = pow(g, (p - 1) // q, p)
+        beta = fixed_base_pow(alpha, private_key, p, q.bit_length())
 
         return p, q, alpha, beta
 
@@ -43,11 +44,43 @@ class DSA:
         if k == 0:
             k = random.randrange(2, q)
 
-        r = pow(alpha, k, p) % q
+        r = fixed_base_pow(alpha, k, p, q.bit_length()) % q
         s = (mod_inverse(k, q) * (msg_hash + private_key * r)) % q
 
         return r, s
 
+    @staticmethod
+    def gen_signatures(public_key, private_key, msg_hashes: list) -> list:
+        """
+        - Signs a batch of message hashes
+        - All the k^(-1) mod q values are computed with a single inversion (see batch_mod_inverse())
+        - A k that gives r = 0 or s = 0 is replaced by a new one. The replacements are inverted together in the next
+          round.
+
+        :param public_key: (p, q, alpha, beta) tuple
+        :param private_key: secret key
+        :param msg_hashes: integer representations of the hashed messages
+        :return: list of (r, s) signatures in input order
+        """
+        p, q, alpha, beta = public_key
+
+        signatures = [None] * len(msg_hashes)
+        pending = list(range(len(msg_hashes)))
+        while pending:
+            ks = [2 + secrets.randbelow(q - 2) for _ in pending]
+            k_invs = batch_mod_inverse(ks, q)
+
+            retry = []
+            for i, k, k_inv in zip(pending, ks, k_invs):
+                r = fixed_base_pow(alpha, k, p, q.bit_length()) % q
+                s = (k_inv * (msg_hashes[i] + private_key * r)) % q
+                if r == 0 or s == 0:
+                    retry.append(i)
+                else:
+                    signatures[i] = (r, s)
+            pending = retry
+        return signatures
+
     @staticmethod
     def verify(public_key, signature, msg_hash: int) -> bool:
         """
@@ -64,6 +97,63 @@ class DSA:
         s_inv = mod_inverse(s, q)
         u1 = (s_inv * msg_hash) % q
         u2 = (s_inv * r) % q
-        v = (((alpha ** u1)*(beta ** u2)) % p) % q
+        v = ((fixed_base_pow(alpha, u1, p, q.bit_length()) * fixed_base_pow(beta, u2, p, q.bit_length())) % p) % q
+
+        return v == r
+
+    @staticmethod
+    def gen_public_key_group(group: Group, private_key: int):
+        """
+        - gen_public_key() over any group of prime order q, e.g. ModPGroup(p, g, q) or an elliptic curve
+          (util.group), where DSA becomes ECDSA
+
+        :param group: Group
+        :param private_key: secret key
+        :return: beta = g^x
+        """
+        if not is_prime(group.order):
+            raise ValueError("The group order must be prime.")
+
+        return group.exp(group.generator, private_key)
+
+    @staticmethod
+    def gen_signature_group(group: Group, private_key: int, msg_hash: int, k=0) -> (int, int):
+        """
+        - gen_signature() over any group, r = to_int(g^k) mod q (the x coordinate for a curve)
+
+        :param group: Group
+        :param private_key: secret key
+        :param msg_hash: integer representation of the hashed message
+        :param k: [if the random number k s.t. 1 < k < q needs to be set explicitly for testing purposes]
+        :return: (r, s) signature
+        """
+        q = group.order
+        while True:
+            k_ = k or 2 + secrets.randbelow(q - 2)
+            r = group.to_int(group.exp(group.generator, k_)) % q
+            s = (mod_inverse(k_, q) * (msg_hash + private_key * r)) % q
+            if k or (r and s):
+                return r, s
+
+    @staticmethod
+    def verify_group(group: Group, public_key, signature, msg_hash: int) -> bool:
+        """
+        - verify() over any group
+
+        :param group: Group
+        :param public_key: beta
+        :param signature: (r, s) pair
+        :param msg_hash: integer representation of the hashed message
+        :return: True/False
+        """
+        q = group.order
+        r, s = signature
+        if not (0 < r < q and 0 < s < q):
+            return False
+
+        s_inv = mod_inverse(s, q)
+        u1 = (s_inv * msg_hash) % q
+        u2 = (s_inv * r) % q
+        v = group.to_int(group.multiply(group.exp(group.generator, u1), group.exp(public_key, u2))) % q
 
         return v == r
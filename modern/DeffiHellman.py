@@ -1,4 +1,5 @@
-from sympy.ntheory.primetest import isprime
+from util.group import Group
+from util.math import fixed_base_pow, is_prime
 
 
 class DeffiHellman:
@@ -13,11 +14,11 @@ class DeffiHellman:
         :param pk_b: B's private key
         :return: k shared key
         """
-        if not isprime(p):
+        if not is_prime(p):
             raise ValueError("p must be prime.")
 
-        pub_a = pow(g, pk_a, p)
-        pub_b = pow(g, pk_b, p)
+        pub_a = fixed_base_pow(g, pk_a, p)
+        pub_b = fixed_base_pow(g, pk_b, p)
 
         k_a = pow(pub_b, pk_a, p)
         k_b = pow(pub_a, pk_b, p)
@@ -26,3 +27,24 @@ class DeffiHellman:
             raise ValueError("Shared key calculation error.")
 
         return k_a
+
+    @staticmethod
+    def gen_shared_key_group(group: Group, pk_a: int, pk_b: int):
+        """
+        - gen_shared_key() over any group, e.g. ModPGroup or an elliptic curve (util.group)
+
+        :param group: Group
+        :param pk_a: A's private key
+        :param pk_b: B's private key
+        :return: k shared key, a group element (group.encode() turns it into bytes)
+        """
+        pub_a = group.exp(group.generator, pk_a)
+        pub_b = group.exp(group.generator, pk_b)
+
+        k_a = group.exp(pub_b, pk_a)
+        k_b = group.exp(pub_a, pk_b)
+
+        if not k_a == k_b:
+            raise ValueError("Shared key calculation error.")
+
+        return k_a
@@ -1,9 +1,17 @@
-from sympy.ntheory.primetest import isprime
+import os
+import queue
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from util.group import Group
 from util.math import *
 
 
 class ElGamal:
     padding = b'\x00'
+    # With block_size='auto' c2 starts with the block size in this many bytes (big endian)
+    header_size = 2
 
     @staticmethod
     def gen_keys(p: int, g: int, private_key: int = -1) -> ((int, int, int), int):
@@ -15,18 +23,18 @@ class ElGamal:
         :param private_key: if empty, a random number is assigned
         :return: (public key (p, g, h), private key) tuple
         """
-        if not isprime(p):
+        if not is_prime(p):
             raise ValueError("p must be prime.")
 
         if private_key == -1:
             private_key = random.randrange(2, p - 1)
 
-        h = pow(g, private_key, p)
+        h = fixed_base_pow(g, private_key, p)
 
         return (p, g, h), private_key
 
     @staticmethod
-    def encrypt__(pub_key: (int, int, int), message: str, k=0, use_bytes=True) -> (int, int):
+    def encrypt__(pub_key: (int, int, int), message: str, k=0, use_bytes=True, pool=None) -> (int, int):
         """
         - This is a basic implementation of ElGamal encryption.
         - The integer 'm' that represents the message, must always be less than to 'p'
@@ -36,13 +44,11 @@ class ElGamal:
         :param message: string
         :param k: [if the random number k s.t. 1 < k < p-1 needs to be set explicitly for testing purposes]
         :param use_bytes: Set this to False, if you want work with only integers without converting to bytes
+        :param pool: [ElGamalPool of pub_key to take (g^k, h^k) from, not used if k is set]
         :return: (c1, c2) cipher pair
         """
         (p, g, h) = pub_key
-
-        if k == 0:
-            k = random.randrange(2, p - 1)
-        c1 = pow(g, k, p)
+        c1, hk = ElGamal._ephemeral(pub_key, k, pool)
 
         if use_bytes:
             m = int.from_bytes(message.encode('utf-8'), byteorder='big')
@@ -52,8 +58,7 @@ class ElGamal:
         if not m < p:
             raise ValueError("m must must be less that p")
 
-        hk = pow(h, k, p)
-        c2 = pow(m * hk, 1, p)
+        c2 = m * hk % p
         return c1, c2
 
     @staticmethod
@@ -71,8 +76,168 @@ class ElGamal:
         c1, c2 = cipher
 
         s = pow(c1, private_key, p)
-        m = pow(c2 * mod_inverse(s, p), 1, p)
+        return ElGamal._to_message(c2 * mod_inverse(s, p) % p, use_bytes)
+
+    @staticmethod
+    def decrypt_batch(pub_key: (int, int, int), private_key: int, ciphertexts: list, use_bytes=True, workers: int = None,
+                      executor: ProcessPoolExecutor = None) -> list:
+        """
+        - Decrypts many encrypt__() ciphertexts under the same private key
+        - Every s = c1^x mod p still needs its own exponentiation, but the inverses of all s are computed with a
+          single modular inversion (Montgomery's trick, see batch_mod_inverse()).
+        - The exponentiations can be spread over worker processes, one contiguous range of c1 values per worker.
+
+        :param pub_key: (p ,g ,h) tuple
+        :param private_key:
+        :param ciphertexts: list of (c1, c2) tuples
+        :param use_bytes: [Set this to False, if the messages are integers]
+        :param workers: [number of processes for the exponentiations, they are done in this process if not set]
+        :param executor: [ProcessPoolExecutor to reuse instead of starting a pool of 'workers' processes]
+        :return: list of decrypted messages, as decrypt__() returns them, in input order
+        """
+        p, _, _ = pub_key
+        c1s = [c1 for c1, _ in ciphertexts]
+
+        if workers is None and executor is None or len(c1s) < 2:
+            s = _pow_all(c1s, private_key, p)
+        else:
+            workers = workers or os.cpu_count() or 1
+            step = -(-len(c1s) // workers)
+            pool = executor or ProcessPoolExecutor(min(workers, len(c1s)))
+            try:
+                futures = [pool.submit(_pow_all, c1s[i:i + step], private_key, p) for i in range(0, len(c1s), step)]
+                s = [v for future in futures for v in future.result()]
+            finally:
+                if executor is None:
+                    pool.shutdown()
+
+        return [ElGamal._to_message(c2 * s_inv % p, use_bytes)
+                for (_, c2), s_inv in zip(ciphertexts, batch_mod_inverse(s, p))]
+
+    @staticmethod
+    def encrypt_exp(pub_key: (int, int, int), m: int, k=0, pool=None) -> (int, int):
+        """
+        - Exponential ElGamal: encrypts g^m instead of m, (c1, c2) = (g^k, g^m * h^k)
+        - Multiplying two ciphertexts component-wise adds their messages (see add() and aggregate())
+        - m is recovered with a discrete logarithm, so it has to be small (see decrypt_exp())
+
+        :param pub_key: (p ,g ,h) tuple
+        :param m: integer s.t. m >= 0
+        :param k: [if the random number k s.t. 1 < k < p-1 needs to be set explicitly for testing purposes]
+        :param pool: [ElGamalPool of pub_key to take (g^k, h^k) from, not used if k is set]
+        :return: (c1, c2) cipher pair
+        """
+        if m < 0:
+            raise ValueError("m must be >= 0")
+
+        (p, g, h) = pub_key
+        c1, hk = ElGamal._ephemeral(pub_key, k, pool)
+        return c1, fixed_base_pow(g, m, p) * hk % p
+
+    @staticmethod
+    def add(pub_key: (int, int, int), a: (int, int), b: (int, int)) -> (int, int):
+        """
+        - Encryption of m_a + m_b from encrypt_exp() ciphertexts of m_a and m_b
+
+        :param pub_key: (p ,g ,h) tuple
+        :return: (c1, c2) cipher pair
+        """
+        p = pub_key[0]
+        return a[0] * b[0] % p, a[1] * b[1] % p
+
+    @staticmethod
+    def aggregate(pub_key: (int, int, int), ciphertexts) -> (int, int):
+        """
+        - Encryption of the sum of all messages of encrypt_exp() ciphertexts, add() over the whole iterable
+        - The ciphertexts are consumed one by one, so a generator can be passed for large inputs
+
+        :param pub_key: (p ,g ,h) tuple
+        :param ciphertexts: iterable of (c1, c2) pairs
+        :return: (c1, c2) cipher pair, an encryption of 0 with k = 0 if there are no ciphertexts
+        """
+        p = pub_key[0]
+        c1, c2 = 1, 1
+        for a1, a2 in ciphertexts:
+            c1 = c1 * a1 % p
+            c2 = c2 * a2 % p
+        return c1, c2
+
+    @staticmethod
+    def decrypt_exp(pub_key: (int, int, int), private_key: int, cipher: (int, int), table: BabyStepTable) -> int:
+        """
+        - Decryption of encrypt_exp(), add() and aggregate() ciphertexts
+        - g^m = c2 * s^(-1) is decrypted as usual, m is then found with the baby-step giant-step table
+
+        :param pub_key: (p ,g ,h) tuple
+        :param private_key:
+        :param cipher: (c1, c2) tuple
+        :param table: BabyStepTable(g, p, bound) with bound > m, best built once and reused (or stored, see
+                      BabyStepTable)
+        :return: m
+        """
+        p, g, _ = pub_key
+        if (table.g, table.p) != (g, p):
+            raise ValueError("The table does not belong to this public key.")
+
+        c1, c2 = cipher
+        s = pow(c1, private_key, p)
+        return table.log(c2 * mod_inverse(s, p) % p)
+
+    @staticmethod
+    def gen_keys_group(group: Group, private_key: int = -1) -> (object, int):
+        """
+        - gen_keys() over any group, e.g. ModPGroup or an elliptic curve (util.group)
+
+        :param group: Group
+        :param private_key: if empty, a random number is assigned
+        :return: (public key h = g^x, private key x) tuple
+        """
+        if private_key == -1:
+            private_key = group.random_exponent()
+
+        return group.exp(group.generator, private_key), private_key
+
+    @staticmethod
+    def encrypt_group(group: Group, pub_key, message: str, k=0, use_bytes=True) -> (object, object):
+        """
+        - encrypt__() over any group: the message integer is embedded as a group element M (see Group.embed()) and
+          encrypted as (g^k, M * h^k)
+        - group.encode() turns the elements into bytes
+
+        :param group: Group
+        :param pub_key: h
+        :param message: string
+        :param k: [if the random number k s.t. 1 < k < order needs to be set explicitly for testing purposes]
+        :param use_bytes: Set this to False, if you want work with only integers without converting to bytes
+        :return: (c1, c2) pair of group elements
+        """
+        if k == 0:
+            k = group.random_exponent()
+
+        if use_bytes:
+            m = int.from_bytes(message.encode('utf-8'), byteorder='big')
+        else:
+            m = int(message)
+
+        return group.exp(group.generator, k), group.multiply(group.embed(m), group.exp(pub_key, k))
+
+    @staticmethod
+    def decrypt_group(group: Group, private_key: int, cipher: (object, object), use_bytes=True) -> str:
+        """
+        - decrypt__() over any group
+
+        :param group: Group
+        :param private_key:
+        :param cipher: (c1, c2) pair of group elements
+        :param use_bytes: [Set this to False, if the message is an integer]
+        :return: string
+        """
+        c1, c2 = cipher
+        s = group.exp(c1, private_key)
+        return ElGamal._to_message(group.extract(group.multiply(c2, group.inverse(s))), use_bytes)
 
+    @staticmethod
+    def _to_message(m: int, use_bytes: bool) -> str:
         if use_bytes:
             m = m.to_bytes((m.bit_length() + 7) // 8, byteorder='big')
             return m.decode('utf-8')
@@ -80,81 +245,243 @@ class ElGamal:
             return str(m)
 
     @staticmethod
-    def encrypt(pub_key: (int, int, int), block_size: int, message: str, k=0) -> (int, bytes):
+    def encrypt(pub_key: (int, int, int), block_size: int, message: str, k=0, pool=None) -> (int, bytes):
         """
         - This is a more generic implementation that allows us to adjust the block size of the
         - encryption to align with the size of public key.
         - Only c2 {C= (c1, c2)} is broken down to blocks.
+        - The mask h^k is the same for every block, it is computed once per message
 
         :param pub_key: (p, g, h)
-        :param block_size: size in bytes per block
+        :param block_size: size in bytes per block, or 'auto' for the largest block size p allows. The block size is
+                           then stored in a header at the start of c2, see decrypt().
         :param message: string
         :param k: [if the random number k s.t. 1 < k < p-1 needs to be set explicitly for testing purposes]
+        :param pool: [ElGamalPool of pub_key to take (g^k, h^k) from, not used if k is set]
         :return: (c1, c2) cipher pair
         """
+        c1, hk = ElGamal._ephemeral(pub_key, k, pool)
+
+        return c1, ElGamal._mask_blocks(pub_key[0], hk, block_size, message.encode('utf-8'))
+
+    @staticmethod
+    def _ephemeral(pub_key: (int, int, int), k: int, pool) -> (int, int):
+        """
+        (g^k, h^k) of one encryption, taken from the pool if there is one and k is not set
+        """
+        if k == 0 and pool is not None:
+            if tuple(pool.pub_key) != tuple(pub_key):
+                raise ValueError("The pool belongs to a different public key.")
+            return pool.get()
+
         (p, g, h) = pub_key
         if k == 0:
             k = random.randrange(2, p - 1)
-        c1 = pow(g, k, p)
+        return fixed_base_pow(g, k, p), fixed_base_pow(h, k, p)
+
+    @staticmethod
+    def decrypt(pub_key: (int, int, int), private_key: int, block_size: int, cipher: (int, bytes)) -> str:
+        """
+        - Generic decryption function
+        - s^(-1) is the same for every block, it is computed once per message
+
+        :param pub_key: (p, g, h)
+        :param private_key:
+        :param block_size: size in bytes per block, or 'auto' if the cipher was encrypted with block_size='auto'
+        :param cipher: (c1, c2)
+        :return: decrypted message string
+        """
+        p, _, _ = pub_key
+        c1, c2 = cipher
+        s = pow(c1, private_key, p)
+
+        return ElGamal._unmask_blocks(p, mod_inverse(s, p), block_size, c2)
+
+    @staticmethod
+    def _mask_blocks(p: int, hk: int, block_size: int, msg_bytes: bytes) -> bytes:
+        """
+        c2 of encrypt(): every block m is encrypted as m * h^k mod p
+        """
+        c_blocks = []
+        if block_size == 'auto':
+            # Largest block size s.t. 2^(block_size * 8) <= p
+            block_size = (p.bit_length() - 1) // 8
+            if block_size < 1:
+                raise ValueError("p must be greater than or equal to 256")
+            c_blocks.append(block_size.to_bytes(ElGamal.header_size, byteorder='big'))
 
         min_n = 2 ** (block_size * 8)
         if p < min_n:
             raise ValueError("Block size and p don't match. p must be greater than or equal to " + str(min_n))
 
-        c_blocks = []
-        msg_bytes = message.encode('utf-8')
         cipher_block_size = (p.bit_length() + 7) // 8
 
-        for i in range(0, len(msg_bytes), block_size):
-            block = msg_bytes[i:i + block_size]
+        # Last block is padded if less than block size
+        msg_bytes += ElGamal.padding * (-len(msg_bytes) % block_size)
 
-            # Last block is padded if less than block size
-            while len(block) < block_size:
-                block += ElGamal.padding
-
-            m = int.from_bytes(block, byteorder='big')
-            hk = pow(h, k, p)
-            c2 = pow(m * hk, 1, p)
+        for i in range(0, len(msg_bytes), block_size):
+            m = int.from_bytes(msg_bytes[i:i + block_size], byteorder='big')
 
             # Encrypted block is converted into a bytes object of the size of p.
             # This enables us to separate the blocks of bytes in the decrypt function.
-            c_bytes = c2.to_bytes(cipher_block_size, byteorder='big')
-            c_blocks.append(c_bytes)
+            c_blocks.append((m * hk % p).to_bytes(cipher_block_size, byteorder='big'))
 
-        return c1, b''.join(c_blocks)
+        return b''.join(c_blocks)
 
     @staticmethod
-    def decrypt(pub_key: (int, int, int), private_key: int, block_size: int, cipher: (int, bytes)) -> str:
+    def _unmask_blocks(p: int, s_inv: int, block_size: int, c2: bytes) -> str:
         """
-        - Generic decryption function
-
-        :param pub_key: (p, g, h)
-        :param private_key:
-        :param block_size: size in bytes per block
-        :param cipher: (c1, c2)
-        :return: decrypted message string
+        Message of decrypt(): every block c is decrypted as c * s^(-1) mod p
         """
-        p, _, _ = pub_key
-        c1, c2 = cipher
-        s = pow(c1, private_key, p)
+        if block_size == 'auto':
+            block_size = int.from_bytes(c2[:ElGamal.header_size], byteorder='big')
+            if len(c2) < ElGamal.header_size or block_size == 0:
+                raise ValueError("The cipher has no valid block size header.")
+            c2 = c2[ElGamal.header_size:]
 
         min_n = 2 ** (block_size * 8)
         if p < min_n:
             raise ValueError("Block size and p don't match. p must be greater than or equal to " + str(min_n))
 
-        message_blocks = []  # list of byte arrays
         cipher_block_size = (p.bit_length() + 7) // 8
+        message_blocks = [(int.from_bytes(c2[i:i + cipher_block_size], byteorder='big') * s_inv % p)
+                          .to_bytes(block_size, byteorder='big') for i in range(0, len(c2), cipher_block_size)]
 
-        for i in range(0, len(c2), cipher_block_size):
-            block = int.from_bytes(c2[i:i + cipher_block_size], byteorder='big')
-            m = pow(block * mod_inverse(s, p), 1, p)
-            b = m.to_bytes(block_size, byteorder='big')
-            message_blocks.append(b)
-
-        # Removing padding
-        last_block = message_blocks[-1]
-        while last_block[-1:] == ElGamal.padding:
-            last_block = last_block[:- 1]
-        message_blocks[-1] = last_block
+        # Removing padding, which can only be in the last block
+        if message_blocks:
+            message_blocks[-1] = message_blocks[-1].rstrip(ElGamal.padding)
 
         return b''.join(message_blocks).decode('utf-8')
+
+
+def _pow_all(values: list, exponent: int, mod: int) -> list:
+    """
+    Worker of ElGamal.decrypt_batch(), module level so that it can be pickled
+    """
+    return [pow(v, exponent, mod) for v in values]
+
+
+class ElGamalContext:
+    """
+    - ElGamal key validated once, for encrypting and decrypting many messages
+    - Per message the mask h^k, or s^(-1) when decrypting, is computed once. The blocks then only take a modular
+      multiplication each (see ElGamal.encrypt() and ElGamal.decrypt(), which produce the same format).
+    """
+    __slots__ = ('p', 'g', 'h', 'private_key')
+
+    def __init__(self, pub_key: (int, int, int), private_key: int = None):
+        """
+        :param pub_key: (p, g, h)
+        :param private_key: [needed for decryption, checked against h]
+        """
+        p, g, h = pub_key
+        if not is_prime(p):
+            raise ValueError("p must be prime.")
+        if not (1 < g < p and 0 < h < p):
+            raise ValueError("g and h must be elements of the group.")
+        if private_key is not None and fixed_base_pow(g, private_key, p) != h:
+            raise ValueError("The private key does not match h.")
+
+        self.p, self.g, self.h = p, g, h
+        self.private_key = private_key
+
+    def encrypt(self, block_size: int, message: str, k=0, pool=None) -> (int, bytes):
+        """
+        See ElGamal.encrypt()
+        """
+        c1, hk = ElGamal._ephemeral((self.p, self.g, self.h), k, pool)
+        return c1, ElGamal._mask_blocks(self.p, hk, block_size, message.encode('utf-8'))
+
+    def decrypt(self, block_size: int, cipher: (int, bytes)) -> str:
+        """
+        See ElGamal.decrypt()
+        """
+        if self.private_key is None:
+            raise ValueError("Decryption needs the private key.")
+
+        c1, c2 = cipher
+        s = pow(c1, self.private_key, self.p)
+        return ElGamal._unmask_blocks(self.p, mod_inverse(s, self.p), block_size, c2)
+
+
+class ElGamalPool:
+    """
+    - Opt-in pool of precomputed ephemeral pairs (g^k mod p, h^k mod p) for one public key
+    - A background thread fills a bounded queue and sleeps once it is full. Taking a pair that leaves 'low_water'
+      or fewer pairs in the queue wakes it up again.
+    - get() computes a pair synchronously when the queue is empty, so encryption never waits for the thread.
+    - Every pair is handed out once, a k must never be used for two messages.
+    - Pass the pool to ElGamal.encrypt(), ElGamal.encrypt__() or ElGamalContext.encrypt(). close() stops the thread,
+      the pool can also be used as a context manager.
+    """
+
+    def __init__(self, pub_key: (int, int, int), size: int = 64, low_water: int = None):
+        """
+        :param pub_key: (p, g, h)
+        :param size: maximum number of pairs kept in the queue
+        :param low_water: [refill once this many or fewer pairs are left, size // 4 by default]
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1.")
+        if low_water is None:
+            low_water = size // 4
+        if not 0 <= low_water < size:
+            raise ValueError("low_water must be in [0, size).")
+
+        self.pub_key = tuple(pub_key)
+        self.size = size
+        self.low_water = low_water
+        self._pairs = queue.Queue(size)
+        self._refill = threading.Event()
+        self._refill.set()
+        self._closed = False
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _pair(self) -> (int, int):
+        p, g, h = self.pub_key
+        # 2 <= k < p - 1 from the OS CSPRNG, pairs are computed ahead of time and must not be predictable
+        k = 2 + secrets.randbelow(p - 3)
+        return fixed_base_pow(g, k, p), fixed_base_pow(h, k, p)
+
+    def _fill(self):
+        while True:
+            self._refill.wait()
+            if self._closed:
+                return
+
+            if self._pairs.full():
+                self._refill.clear()
+                # A pair may have been taken after full(), its get() would then not see the cleared event
+                if self._pairs.qsize() <= self.low_water:
+                    self._refill.set()
+            else:
+                # Only this thread puts pairs, so there is always room
+                self._pairs.put_nowait(self._pair())
+
+    def get(self) -> (int, int):
+        """
+        :return: (g^k mod p, h^k mod p) for a fresh random k
+        """
+        try:
+            pair = self._pairs.get_nowait()
+        except queue.Empty:
+            pair = self._pair()
+
+        if self._pairs.qsize() <= self.low_water:
+            self._refill.set()
+        return pair
+
+    def __len__(self):
+        return self._pairs.qsize()
+
+    def close(self):
+        self._closed = True
+        self._refill.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,103 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import prod
+from multiprocessing import shared_memory
 from util.math import *
-from sympy.ntheory.primetest import isprime
+
+
+class _RSAKey:
+    """
+    - Values derived from the modulus n, computed once when the key is created
+    """
+    __slots__ = ('n', 'byte_length', 'max_block_size')
+
+    def __init__(self, n: int):
+        self.n = n
+        # Size in bytes of an encrypted block
+        self.byte_length = (n.bit_length() + 7) // 8
+        # Largest block size s.t. 2^(block_size * 8) <= n
+        self.max_block_size = (n.bit_length() - 1) // 8
+
+    def check_block_size(self, block_size: int):
+        if block_size < 1:
+            raise ValueError("block_size must be >= 1")
+        if block_size > self.max_block_size:
+            raise ValueError("n must be greater than or equal to " + str(2 ** (block_size * 8)))
+
+
+class RSAPublicKey(_RSAKey):
+    """
+    - RSA public key (n, e)
+    - Unpacks like the (n, e) tuple of RSA.gen_public_key()
+    """
+    __slots__ = ('e',)
+
+    def __init__(self, n: int, e: int):
+        super().__init__(n)
+        self.e = e
+
+    def __iter__(self):
+        return iter((self.n, self.e))
+
+    def __repr__(self):
+        return 'RSAPublicKey(n=' + str(self.n) + ', e=' + str(self.e) + ')'
+
+    def encrypt_int(self, m: int) -> int:
+        return pow(m, self.e, self.n)
+
+
+class RSAPrivateKey(_RSAKey):
+    """
+    - RSA private key (n, d)
+    - Optionally carries the CRT parameters (p, q, dp, dq, q_inv, ...) used to speed up decryption, and the public
+      exponent e
+    - Unpacks like the (n, d) tuple of RSA.gen_private_key()
+    """
+    __slots__ = ('d', 'crt', 'e')
+
+    def __init__(self, n: int, d: int, crt: tuple = None, e: int = None):
+        super().__init__(n)
+        self.d = d
+        self.crt = crt
+        self.e = e
+
+    @classmethod
+    def from_primes(cls, p: int, q: int, e: int, others: list = ()):
+        """
+        Private key with CRT parameters, the primes are validated once here
+        - others: [additional primes of a multi-prime key, see RSA.gen_private_key_crt()]
+        """
+        n, d, crt = RSA.gen_private_key_crt(p, q, e, others)
+        return cls(n, d, crt, e)
+
+    @property
+    def public_key(self) -> RSAPublicKey:
+        if self.e is None:
+            raise ValueError("The public exponent of this key is unknown.")
+        return RSAPublicKey(self.n, self.e)
+
+    def __iter__(self):
+        return iter((self.n, self.d))
+
+    def __repr__(self):
+        return 'RSAPrivateKey(n=' + str(self.n) + ', d=...)'
+
+    def decrypt_int(self, c: int) -> int:
+        return RSA._decrypt_int(c, self.n, self.d, self.crt)
 
 
 class RSA:
     fermat_primes = [3, 5, 17, 257, 65537]
     padding = b'\x00'
+    # Bytes read at a time from file objects by the stream functions
+    stream_chunk_size = 1 << 16
+    # The stream functions end the data with this byte followed by RSA.padding up to the block size (ISO/IEC 7816-4),
+    # so trailing zero bytes of binary data survive
+    stream_padding = b'\x80'
+    # With block_size='auto' the cipher starts with the block size in this many bytes (big endian)
+    header_size = 2
+    # Smallest batch decrypt_batch() decrypts with Fiat's method
+    min_batch_size = 2
 
     @staticmethod
     def gen_public_key(p: int, q: int) -> (int, int):
@@ -15,7 +108,7 @@ class RSA:
         :param q: prime number
         :return: tuple (n, e) where n=p*q, e = public key (encryption exponent)
         """
-        if not (isprime(p) and isprime(q)):
+        if not (is_prime(p) and is_prime(q)):
             raise ValueError("p & q must be prime.")
 
         phi = (p - 1) * (q - 1)
@@ -27,8 +120,9 @@ class RSA:
                 break
 
         # In case 'e' not one of Fermat's primes
+        # phi is even, hence only odd candidates can be coprime to it
         if e == 0:
-            for i in range(4, phi):
+            for i in range(5, phi, 2):
                 if gcd(phi, i) == 1:
                     e = i
                     break
@@ -45,7 +139,7 @@ class RSA:
         :param e: public key (encryption exponent)
         :return: tuple (n, d) where n=p*q, d = private key (decryption exponent)
         """
-        if not (isprime(p) and isprime(q)):
+        if not (is_prime(p) and is_prime(q)):
             raise ValueError("p & q must be prime.")
 
         phi = (p - 1) * (q - 1)
@@ -54,6 +148,261 @@ class RSA:
 
         return p * q, mod_inverse(e, phi)
 
+    @staticmethod
+    def generate(bits: int, e: int = 65537, workers: int = None, primes: int = 2) -> RSAPrivateKey:
+        """
+        - Generate a key pair with a modulus of the given bit length
+        - The primes are searched for concurrently when 'workers' is set (see random_primes())
+        - Primes p with gcd(e, p - 1) != 1 are skipped, since e would not be invertible mod phi
+        - With primes > 2 a multi-prime key (as in PKCS #1 v2.1) is generated, n is the product of 'primes' primes
+          of about bits / primes bits each. Private key operations get faster with every extra prime, since the
+          CRT exponentiations get smaller.
+
+        :param bits: bit length of n, bits >= 8 * primes
+        :param e: public key (encryption exponent), odd and >= 3
+        :param workers: [size of the process pool used for the prime search]
+        :param primes: [number of prime factors of n]
+        :return: RSAPrivateKey with CRT parameters, the public key is RSAPrivateKey.public_key
+        """
+        if primes < 2:
+            raise ValueError("primes must be >= 2")
+        if bits < max(16, 8 * primes):
+            raise ValueError("bits must be >= " + str(max(16, 8 * primes)))
+        if e < 3 or e % 2 == 0:
+            raise ValueError("e must be odd and >= 3")
+
+        # Prime sizes that add up to 'bits', primes of equal size are searched for together
+        sizes = {}
+        for i in range(primes):
+            size = bits // primes + (1 if i < bits % primes else 0)
+            sizes[size] = sizes.get(size, 0) + 1
+
+        while True:
+            factors = [r for size, count in sizes.items() for r in random_primes(size, count, workers, e)]
+
+            # The two most significant bits of each prime are set, so the product of 2 primes has exactly 'bits'
+            # bits. With more primes it can be a bit short.
+            if prod(factors).bit_length() == bits:
+                return RSAPrivateKey.from_primes(factors[0], factors[1], e, factors[2:])
+
+    @staticmethod
+    def gen_crt_params(p: int, q: int, d: int, others: list = ()) -> tuple:
+        """
+        - Chinese Remainder Theorem parameters of the private key (as in PKCS #1)
+        - Decryption with these is done with 2 half size exponentiations instead of 1 full size one
+        - For a multi-prime key, every additional prime r_i gets a triple (r_i, d_i, t_i) where d_i = d mod (r_i - 1)
+          and t_i = (p * q * r_3 * ... * r_(i-1))^(-1) mod r_i
+
+        :param p: prime number
+        :param q: prime number
+        :param d: private key (decryption exponent)
+        :param others: [additional primes of a multi-prime key]
+        :return: tuple (p, q, dp, dq, q_inv, (r_3, d_3, t_3), ...) where dp = d mod (p-1), dq = d mod (q-1),
+                 q_inv = q^(-1) mod p
+        """
+        if len({p, q, *others}) != 2 + len(others):
+            raise ValueError("p & q must be distinct.")
+
+        crt = (p, q, d % (p - 1), d % (q - 1), mod_inverse(q % p, p))
+        r = p * q
+        for r_i in others:
+            crt += ((r_i, d % (r_i - 1), mod_inverse(r % r_i, r_i)),)
+            r *= r_i
+        return crt
+
+    @staticmethod
+    def gen_private_key_crt(p: int, q: int, e: int, others: list = ()) -> (int, int, tuple):
+        """
+        - Generate private key along with its CRT parameters
+
+        :param p: prime number
+        :param q: prime number
+        :param e: public key (encryption exponent)
+        :param others: [additional primes of a multi-prime key, n = p * q * r_3 * ... * r_k]
+        :return: tuple (n, d, crt) where crt = (p, q, dp, dq, q_inv, ...), see gen_crt_params()
+        """
+        if not others:
+            n, d = RSA.gen_private_key(p, q, e)
+            return n, d, RSA.gen_crt_params(p, q, d)
+
+        factors = [p, q, *others]
+        if not all(is_prime(r) for r in factors):
+            raise ValueError("All factors of n must be prime.")
+        if len(set(factors)) != len(factors):
+            raise ValueError("The factors of n must be distinct.")
+
+        phi = prod(r - 1 for r in factors)
+        if phi < e or gcd(phi, e) != 1:
+            raise ValueError("Invalid public key")
+
+        d = mod_inverse(e, phi)
+        return prod(factors), d, RSA.gen_crt_params(p, q, d, others)
+
+    @staticmethod
+    def _decrypt_int(c: int, n: int, d: int, crt: tuple = None) -> int:
+        """
+        - c^d mod n
+        - With the CRT parameters, m1 = c^dp mod p and m2 = c^dq mod q are recombined with Garner's formula
+          m = m2 + q * (q_inv * (m1 - m2) mod p)
+        - Every additional prime r_i of a multi-prime key is then added in the same way:
+          m = m + R * (t_i * (m_i - m) mod r_i) where m_i = c^d_i mod r_i and R = p * q * ... * r_(i-1)
+        """
+        if crt is None:
+            return pow(c, d, n)
+
+        p, q, dp, dq, q_inv, *others = crt
+        m1 = pow(c % p, dp, p)
+        m2 = pow(c % q, dq, q)
+        m = m2 + q * ((q_inv * (m1 - m2)) % p)
+
+        r = p * q
+        for r_i, d_i, t_i in others:
+            m += r * ((t_i * (pow(c % r_i, d_i, r_i) - m)) % r_i)
+            r *= r_i
+        return m
+
+    @staticmethod
+    def gen_batch_public_keys(private_key: RSAPrivateKey, count: int) -> list:
+        """
+        - Public keys (n, e_1), ..., (n, e_count) for batch decryption (see decrypt_batch())
+        - The exponents are the smallest odd primes coprime to phi, hence they are distinct and pairwise coprime
+
+        :param private_key: RSAPrivateKey with CRT parameters
+        :param count: number of public keys
+        :return: list of RSAPublicKey sharing the modulus of private_key
+        """
+        phi = RSA._phi(private_key)
+        exponents = []
+        e = 3
+        while len(exponents) < count:
+            if gcd(e, phi) == 1:
+                exponents.append(e)
+            e = next_prime(e)
+        return [RSAPublicKey(private_key.n, e) for e in exponents]
+
+    @staticmethod
+    def decrypt_batch(private_key: RSAPrivateKey, ciphertexts: list, use_bytes=True) -> list:
+        """
+        - Batch RSA (Fiat): decrypts many encrypt__() ciphertexts under public keys that share n but have distinct,
+          pairwise coprime small exponents (see gen_batch_public_keys())
+        - The ciphertexts are grouped into batches holding at most one ciphertext per exponent. A batch c_1, ..., c_b
+          with E = e_1 * ... * e_b is combined in a product tree into M = c_1^(E/e_1) * ... * c_b^(E/e_b), so that a
+          single full size exponentiation gives M^(1/E) = m_1 * ... * m_b.
+          The product is then split back down the tree, using only exponents of the size of E and one batch
+          inversion per level (see _split_batch()).
+        - Batches smaller than RSA.min_batch_size are decrypted one by one with CRT instead
+
+        :param private_key: RSAPrivateKey with CRT parameters (the factors of n are needed)
+        :param ciphertexts: list of (e, c) pairs where c = encrypt__(n, e, ...)
+        :param use_bytes: Set this to False, if the messages are integers.
+        :return: list of decrypted messages, as decrypt__() returns them, in input order
+        """
+        if private_key.crt is None:
+            raise ValueError("The private key must have CRT parameters.")
+
+        n = private_key.n
+        exponents = sorted({e for e, _ in ciphertexts})
+        E = prod(exponents)
+        for e in exponents:
+            if e < 2 or gcd(e, E // e) != 1:
+                raise ValueError("The public exponents must be distinct and pairwise coprime.")
+
+        # Ciphertexts that share a factor with n (e.g. 0) can't be inverted, they are decrypted one by one
+        queues = {e: [] for e in exponents}
+        single = []
+        for i, (e, c) in enumerate(ciphertexts):
+            if gcd(c, n) == 1:
+                queues[e].append(i)
+            else:
+                single.append(i)
+
+        # j-th batch: the j-th ciphertext of each exponent
+        batches = []
+        for j in range(max(map(len, queues.values()), default=0)):
+            batch = [queue[j] for queue in queues.values() if j < len(queue)]
+            if len(batch) < RSA.min_batch_size:
+                single += batch
+            else:
+                batches.append(batch)
+
+        phi = RSA._phi(private_key)
+        crts = {e: RSA._crt_exponent(private_key.crt, mod_inverse(e, phi)) for e in exponents}
+        messages = [None] * len(ciphertexts)
+        for i in single:
+            e, c = ciphertexts[i]
+            messages[i] = RSA._decrypt_int(c, n, None, crts[e])
+        for batch in batches:
+            exps = [ciphertexts[i][0] for i in batch]
+            ms = RSA._split_batch(private_key, phi, exps, [ciphertexts[i][1] for i in batch])
+            for i, m in zip(batch, ms):
+                messages[i] = m
+
+        return [RSA._to_message(m, use_bytes) for m in messages]
+
+    @staticmethod
+    def _split_batch(private_key: RSAPrivateKey, phi: int, exponents: list, ciphertexts: list) -> list:
+        """
+        - Fiat's batch decryption of c_i under e_i for i = 1..b, the exponents are pairwise coprime
+        - Up the tree every node holds E = product of its exponents and M = product of c_i^(E/e_i)
+        - Down the tree every node gets A = product of its m_i. A node with children L and R is split with
+          X = 0 mod E_L, X = 1 mod E_R:
+          A^X = A_L^X * A_R^X = M_L^(X/E_L) * A_R * M_R^((X-1)/E_R)
+          hence A_R = A^X / (M_L^(X/E_L) * M_R^((X-1)/E_R)) and A_L = A / A_R
+        """
+        n = private_key.n
+        e_tree = product_tree(exponents)
+        m_tree = [[c % n for c in ciphertexts]]
+        for k in range(len(e_tree) - 1):
+            es, ms = e_tree[k], m_tree[k]
+            m_tree.append([pow(ms[i], es[i + 1], n) * pow(ms[i + 1], es[i], n) % n if i + 1 < len(ms) else ms[i]
+                           for i in range(0, len(ms), 2)])
+
+        # The only full size exponentiation
+        E = e_tree[-1][0]
+        a = [RSA._decrypt_int(m_tree[-1][0], n, None, RSA._crt_exponent(private_key.crt, mod_inverse(E, phi)))]
+
+        for k in range(len(e_tree) - 2, -1, -1):
+            es, ms = e_tree[k], m_tree[k]
+            pairs = [j for j in range(len(a)) if 2 * j + 1 < len(ms)]
+
+            right = []
+            denominators = []
+            for j in pairs:
+                e_l, e_r = es[2 * j], es[2 * j + 1]
+                x = e_l * mod_inverse(e_l % e_r, e_r)
+                right.append(pow(a[j], x, n))
+                denominators.append(pow(ms[2 * j], x // e_l, n) * pow(ms[2 * j + 1], (x - 1) // e_r, n) % n)
+            right = [r * inv % n for r, inv in zip(right, batch_mod_inverse(denominators, n))]
+            left = [a[j] * inv % n for j, inv in zip(pairs, batch_mod_inverse(right, n))]
+
+            # A node without a sibling was carried up the tree unchanged
+            split = dict(zip(pairs, zip(left, right)))
+            a = [x for j in range(len(a)) for x in split.get(j, (a[j],))]
+        return a
+
+    @staticmethod
+    def _phi(private_key: RSAPrivateKey) -> int:
+        if private_key.crt is None:
+            raise ValueError("The private key must have CRT parameters.")
+        p, q, _, _, _, *others = private_key.crt
+        return prod(r - 1 for r in [p, q] + [r_i for r_i, _, _ in others])
+
+    @staticmethod
+    def _crt_exponent(crt: tuple, d: int) -> tuple:
+        """
+        CRT parameters for the decryption exponent d, with the same primes and coefficients as 'crt'
+        """
+        p, q, _, _, q_inv, *others = crt
+        return (p, q, d % (p - 1), d % (q - 1), q_inv) + tuple((r_i, d % (r_i - 1), t_i) for r_i, _, t_i in others)
+
+    @staticmethod
+    def _to_message(m: int, use_bytes=True) -> str:
+        if use_bytes:
+            m = m.to_bytes((m.bit_length() + 7) // 8, byteorder='big')
+            return m.decode('utf-8')
+        else:
+            return str(m)
+
     @staticmethod
     def encrypt__(n: int, e: int, message: str, use_bytes=True) -> int:
         """
@@ -79,7 +428,7 @@ class RSA:
         return c
 
     @staticmethod
-    def decrypt__(n: int, d: int, cipher: int, use_bytes=True) -> str:
+    def decrypt__(n: int, d: int, cipher: int, use_bytes=True, crt=None) -> str:
         """
         - This is a basic implementation of RSA decryption
         - Used to decrypt output from encrypt__() function
@@ -88,93 +437,308 @@ class RSA:
         :param d: private key (decryption exponent)
         :param cipher: integer that represents the original encryption
         :param use_bytes: Set this to False, if the message is an integer.
+        :param crt: [CRT parameters (p, q, dp, dq, q_inv) of the private key, see gen_crt_params()]
         :return: decrypted text
         """
-        m = pow(cipher, d, n)
-
-        if use_bytes:
-            m = m.to_bytes((m.bit_length() + 7) // 8, byteorder='big')
-            return m.decode('utf-8')
-        else:
-            return str(m)
+        m = RSA._decrypt_int(cipher, n, d, crt)
+        return RSA._to_message(m, use_bytes)
 
     @staticmethod
-    def encrypt(n: int, e: int, block_size: int, message: str) -> bytes:
+    def encrypt(n: int, e: int, block_size: int, message: str, workers: int = None,
+                executor: ProcessPoolExecutor = None) -> bytes:
         """
         This is a more generic implementation that allows us to adjust the block size of the
         encryption to align with the size of n.
 
         :param n: p * q
         :param e: public key (encryption exponent)
-        :param block_size: size in bytes per block
+        :param block_size: size in bytes per block, or 'auto' for the largest block size n allows. The block size is
+                           then stored in a header at the start of the cipher, see decrypt().
         :param message: string
+        :param workers: [number of processes the blocks are split across, see _parallel_blocks()]
+        :param executor: [ProcessPoolExecutor to reuse instead of starting a pool of 'workers' processes]
         :return: bytes object of the encrypted message
         """
-        min_n = 2 ** (block_size * 8)
-        if n < min_n:
-            raise ValueError("n must be greater than or equal to " + str(min_n))
+        return RSA.encrypt_key(RSAPublicKey(n, e), block_size, message, workers, executor)
 
-        c_blocks = []
-        msg_bytes = message.encode('utf-8')
-        for i in range(0, len(msg_bytes), block_size):
-            block = msg_bytes[i:i + block_size]
+    @staticmethod
+    def encrypt_key(key: RSAPublicKey, block_size: int, message: str, workers: int = None,
+                    executor: ProcessPoolExecutor = None) -> bytes:
+        """
+        encrypt() with an RSAPublicKey, whose derived values are not recomputed on every call
+        """
+        header = b''
+        if block_size == 'auto':
+            block_size = key.max_block_size
+            header = block_size.to_bytes(RSA.header_size, byteorder='big')
+        key.check_block_size(block_size)
 
-            # Last block is padded if less than block size
-            while len(block) < block_size:
-                block += RSA.padding
+        msg_bytes = message.encode('utf-8')
 
-            m = int.from_bytes(block, byteorder='big')
-            c = pow(m, e, n)
+        # Last block is padded if less than block size
+        msg_bytes += RSA.padding * (-len(msg_bytes) % block_size)
 
-            # Encrypted block is converted into a bytes object of the size of n.
-            # This enables us to separate the blocks of bytes in the decrypt function.
-            c_bytes = c.to_bytes((n.bit_length() + 7) // 8, byteorder='big')
-            c_blocks.append(c_bytes)
+        if workers or executor:
+            return header + RSA._parallel_blocks(key, 'encrypt_int', msg_bytes, block_size, key.byte_length, workers,
+                                                 executor)
 
-        return b''.join(c_blocks)
+        # Encrypted block is converted into a bytes object of the size of n.
+        # This enables us to separate the blocks of bytes in the decrypt function.
+        e, n, cipher_block_size = key.e, key.n, key.byte_length
+        c_blocks = [pow(int.from_bytes(msg_bytes[i:i + block_size], byteorder='big'), e, n)
+                    for i in range(0, len(msg_bytes), block_size)]
+        return header + b''.join([c.to_bytes(cipher_block_size, byteorder='big') for c in c_blocks])
 
     @staticmethod
-    def decrypt(n: int, d: int, block_size: int, cipher: bytes) -> str:
+    def decrypt(n: int, d: int, block_size: int, cipher: bytes, crt=None, workers: int = None,
+                executor: ProcessPoolExecutor = None) -> str:
         """
         Generic decryption function
 
         :param n: p * q
         :param d: private key (decryption exponent)
-        :param block_size: size in bytes per block
+        :param block_size: size in bytes per block, or 'auto' if the cipher was encrypted with block_size='auto'
         :param cipher: bytes object
+        :param crt: [CRT parameters (p, q, dp, dq, q_inv) of the private key, see gen_crt_params()]
+        :param workers: [number of processes the blocks are split across, see _parallel_blocks()]
+        :param executor: [ProcessPoolExecutor to reuse instead of starting a pool of 'workers' processes]
         :return: decrypted message string
         """
-        min_n = 2 ** (block_size * 8)
-        if n < min_n:
-            raise ValueError("n must be greater than or equal to " + str(min_n))
+        return RSA.decrypt_key(RSAPrivateKey(n, d, crt), block_size, cipher, workers, executor)
 
-        message_blocks = []  # list of byte arrays
-        cipher_block_size = (n.bit_length() + 7) // 8
+    @staticmethod
+    def decrypt_key(key: RSAPrivateKey, block_size: int, cipher: bytes, workers: int = None,
+                    executor: ProcessPoolExecutor = None) -> str:
+        """
+        decrypt() with an RSAPrivateKey, whose derived values (and CRT parameters) are not recomputed on every call
+        """
+        if block_size == 'auto':
+            block_size, cipher = RSA._read_header(cipher)
+        key.check_block_size(block_size)
 
-        for i in range(0, len(cipher), cipher_block_size):
-            block = int.from_bytes(cipher[i:i + cipher_block_size], byteorder='big')
-            m = pow(block, d, n)
-            b = m.to_bytes(block_size, byteorder='big')
-            message_blocks.append(b)
+        cipher_block_size = key.byte_length
 
-        # Removing padding
-        last_block = message_blocks[-1]
-        while last_block[-1:] == RSA.padding:
-            last_block = last_block[:- 1]
-        message_blocks[-1] = last_block
+        if workers or executor:
+            if len(cipher) % cipher_block_size:
+                raise ValueError("The length of the cipher must be a multiple of " + str(cipher_block_size))
+            message = RSA._parallel_blocks(key, 'decrypt_int', cipher, cipher_block_size, block_size, workers,
+                                           executor)
+        else:
+            decrypt_int = key.decrypt_int
+            message_blocks = [decrypt_int(int.from_bytes(cipher[i:i + cipher_block_size], byteorder='big'))
+                              for i in range(0, len(cipher), cipher_block_size)]
+            message = b''.join([m.to_bytes(block_size, byteorder='big') for m in message_blocks])
 
-        return b''.join(message_blocks).decode('utf-8')
+        return str(RSA._strip_padding(message, block_size), 'utf-8')
+
+    @staticmethod
+    def _read_header(cipher: bytes) -> (int, bytes):
+        """
+        Splits a cipher encrypted with block_size='auto' into the block size and the encrypted blocks
+        """
+        block_size = int.from_bytes(cipher[:RSA.header_size], byteorder='big')
+        if len(cipher) < RSA.header_size or block_size == 0:
+            raise ValueError("The cipher has no valid block size header.")
+        return block_size, cipher[RSA.header_size:]
+
+    @staticmethod
+    def _strip_padding(message: bytes, block_size: int) -> memoryview:
+        """
+        Removes the padding in one pass, it can only be in the last block
+        """
+        last_block = len(message) - min(block_size, len(message))
+        return memoryview(message)[:last_block + len(message[last_block:].rstrip(RSA.padding))]
+
+    @staticmethod
+    def _parallel_blocks(key: _RSAKey, method: str, data: bytes, in_size: int, out_size: int, workers: int = None,
+                         executor: ProcessPoolExecutor = None) -> bytes:
+        """
+        - Applies key.<method> (encrypt_int or decrypt_int) to every 'in_size' byte block of data in a process pool
+        - The blocks are split into one contiguous range per worker. The input and the output are placed in shared
+          memory, so each worker reads its slice and writes its results in place without copying the buffers
+          through pipes, and the output keeps the order of the input.
+
+        :param data: input, its length is a multiple of in_size
+        :param workers: number of ranges (and processes if no executor is given), defaults to the cpu count
+        :return: the output blocks, 'out_size' bytes each
+        """
+        count = len(data) // in_size
+        workers = workers or os.cpu_count() or 1
+        if count == 0:
+            return b''
+
+        source = shared_memory.SharedMemory(create=True, size=len(data))
+        target = shared_memory.SharedMemory(create=True, size=count * out_size)
+        pool = executor or ProcessPoolExecutor(min(workers, count))
+        try:
+            source.buf[:len(data)] = data
+            step = -(-count // workers)
+            futures = [pool.submit(_crypt_range, key, method, source.name, target.name, in_size, out_size,
+                                   start, min(start + step, count))
+                       for start in range(0, count, step)]
+            for future in futures:
+                future.result()
+            return bytes(target.buf[:count * out_size])
+        finally:
+            if executor is None:
+                pool.shutdown()
+            for shm in (source, target):
+                shm.close()
+                shm.unlink()
+
+    @staticmethod
+    def encrypt_stream(n: int, e: int, block_size: int, source):
+        """
+        - Streaming version of encrypt() for binary data
+        - The input is consumed incrementally and every encrypted block is yielded as soon as it is produced, so
+          memory use does not depend on the size of the input
+        - Unlike encrypt(), the padding keeps the exact length of the data: the data always ends with
+          RSA.stream_padding followed by zero bytes up to the block size, which can add a whole block. Only
+          decrypt_stream() can decrypt the output.
+
+        :param n: p * q
+        :param e: public key (encryption exponent)
+        :param block_size: size in bytes per block
+        :param source: binary file object, or iterable of bytes objects
+        :return: generator of encrypted blocks, each of the size of n in bytes
+        """
+        return RSA.encrypt_stream_key(RSAPublicKey(n, e), block_size, source)
+
+    @staticmethod
+    def encrypt_stream_key(key: RSAPublicKey, block_size: int, source):
+        """
+        encrypt_stream() with an RSAPublicKey
+        """
+        key.check_block_size(block_size)
+        return RSA._encrypt_blocks(key, block_size, RSA._blocks(source, block_size))
+
+    @staticmethod
+    def _encrypt_blocks(key: RSAPublicKey, block_size: int, blocks):
+        last = b''
+        for block in blocks:
+            # Only the last block can be shorter than the block size
+            if len(block) < block_size:
+                last = block
+                break
+            c = key.encrypt_int(int.from_bytes(block, byteorder='big'))
+            yield c.to_bytes(key.byte_length, byteorder='big')
+
+        last += RSA.stream_padding + RSA.padding * (block_size - len(last) - 1)
+        c = key.encrypt_int(int.from_bytes(last, byteorder='big'))
+        yield c.to_bytes(key.byte_length, byteorder='big')
+
+    @staticmethod
+    def decrypt_stream(n: int, d: int, block_size: int, source, crt=None):
+        """
+        - Streaming version of decrypt() for binary data
+        - Decrypted blocks are yielded one block behind the input, since the padding can only be removed once the
+          last block is known
+        - Decrypts the output of encrypt_stream(), the data comes back with its exact length
+
+        :param n: p * q
+        :param d: private key (decryption exponent)
+        :param block_size: size in bytes per block
+        :param source: binary file object, or iterable of bytes objects
+        :param crt: [CRT parameters (p, q, dp, dq, q_inv) of the private key, see gen_crt_params()]
+        :return: generator of decrypted blocks (bytes)
+        """
+        return RSA.decrypt_stream_key(RSAPrivateKey(n, d, crt), block_size, source)
+
+    @staticmethod
+    def decrypt_stream_key(key: RSAPrivateKey, block_size: int, source):
+        """
+        decrypt_stream() with an RSAPrivateKey
+        """
+        key.check_block_size(block_size)
+        return RSA._decrypt_blocks(key, block_size, RSA._blocks(source, key.byte_length))
+
+    @staticmethod
+    def _decrypt_blocks(key: RSAPrivateKey, block_size: int, blocks):
+        previous = None
+        for block in blocks:
+            if len(block) < key.byte_length:
+                raise ValueError("The length of the cipher must be a multiple of " + str(key.byte_length))
+            if previous is not None:
+                yield previous
+            m = key.decrypt_int(int.from_bytes(block, byteorder='big'))
+            previous = m.to_bytes(block_size, byteorder='big')
+
+        # Removing padding: the zero bytes and the RSA.stream_padding byte before them
+        last = b'' if previous is None else previous.rstrip(RSA.padding)
+        if not last.endswith(RSA.stream_padding):
+            raise ValueError("The cipher has no valid stream padding.")
+        yield last[:-1]
+
+    @staticmethod
+    def _blocks(source, size: int):
+        """
+        Regroups the chunks read from 'source' into blocks of 'size' bytes, only the last block can be shorter
+        """
+        buffer = bytearray()
+        for chunk in RSA._chunks(source):
+            buffer += chunk
+            full = len(buffer) - len(buffer) % size
+            for i in range(0, full, size):
+                yield bytes(buffer[i:i + size])
+            del buffer[:full]
+        if buffer:
+            yield bytes(buffer)
+
+    @staticmethod
+    def _chunks(source):
+        if not hasattr(source, 'read'):
+            yield from source
+            return
+        while True:
+            chunk = source.read(RSA.stream_chunk_size)
+            if not chunk:
+                return
+            yield chunk
 
     @staticmethod
     def encrypt_32bit(n: int, e: int, message: str):
         """
         block size = 4 bytes
+        - For large n, encrypt() with block_size='auto' needs far fewer blocks
         """
         return RSA.encrypt(n, e, 4, message)
 
     @staticmethod
-    def decrypt_32bit(n: int, d: int, cipher: bytes) -> str:
+    def encrypt_32bit_key(key: RSAPublicKey, message: str):
+        """
+        encrypt_32bit() with an RSAPublicKey
+        """
+        return RSA.encrypt_key(key, 4, message)
+
+    @staticmethod
+    def decrypt_32bit(n: int, d: int, cipher: bytes, crt=None) -> str:
         """
         block size = 4 bytes
         """
-        return RSA.decrypt(n, d, 4, cipher)
+        return RSA.decrypt(n, d, 4, cipher, crt)
+
+    @staticmethod
+    def decrypt_32bit_key(key: RSAPrivateKey, cipher: bytes) -> str:
+        """
+        decrypt_32bit() with an RSAPrivateKey
+        """
+        return RSA.decrypt_key(key, 4, cipher)
+
+
+def _crypt_range(key: _RSAKey, method: str, source_name: str, target_name: str, in_size: int, out_size: int,
+                 start: int, stop: int):
+    """
+    Worker of RSA._parallel_blocks(), processes the blocks start, ..., stop - 1 of the shared input in place
+    """
+    source = shared_memory.SharedMemory(source_name)
+    target = shared_memory.SharedMemory(target_name)
+    crypt = getattr(key, method)
+    try:
+        src, dst = source.buf, target.buf
+        for i in range(start, stop):
+            m = int.from_bytes(src[i * in_size:(i + 1) * in_size], byteorder='big')
+            dst[i * out_size:(i + 1) * out_size] = crypt(m).to_bytes(out_size, byteorder='big')
+        del src, dst
+    finally:
+        source.close()
+        target.close()
@@ -1,5 +1,7 @@
 from unittest import TestCase
 from modern.DSA import *
+from util.group import ModPGroup, P256
+from util.math import random_schnorr_group
 
 
 class TestDSA(TestCase):
@@ -16,3 +18,56 @@ class TestDSA(TestCase):
 
         check = DSA.verify(public_key, signature, message_hash)
         self.assertTrue(check)
+
+    def test_gen_signatures(self):
+        p, q, g, private_key = 131, 13, 2, 6
+        public_key = DSA.gen_public_key(p, q, g, private_key)
+
+        self.assertEqual(DSA.gen_signatures(public_key, private_key, []), [])
+
+        message_hashes = [27, 5, 11, 100, 3]
+        signatures = DSA.gen_signatures(public_key, private_key, message_hashes)
+        self.assertEqual(len(signatures), len(message_hashes))
+        for signature, message_hash in zip(signatures, message_hashes):
+            self.assertTrue(DSA.verify(public_key, signature, message_hash))
+
+        # With q = 13, r = 0 or s = 0 comes up often and has to be redrawn
+        message_hashes = list(range(200))
+        for signature, message_hash in zip(DSA.gen_signatures(public_key, private_key, message_hashes), message_hashes):
+            r, s = signature
+            self.assertTrue(0 < r < 13 and 0 < s < 13)
+            self.assertTrue(DSA.verify(public_key, signature, message_hash))
+
+    def test_large_group(self):
+        # Large enough for the fixed base tables (see fixed_base_pow())
+        p, q, g = random_schnorr_group(512, 160)
+        private_key = 123456789
+        public_key = DSA.gen_public_key(p, q, g, private_key)
+        _, _, alpha, beta = public_key
+        self.assertEqual(beta, pow(alpha, private_key, p))
+
+        for message_hash in range(10):
+            signature = DSA.gen_signature(public_key, private_key, message_hash)
+            self.assertTrue(DSA.verify(public_key, signature, message_hash))
+            self.assertFalse(DSA.verify(public_key, signature, message_hash + 1))
+
+    def test_group(self):
+        # Same signatures as DSA over ModPGroup(p, alpha, q)
+        p, q, g, private_key = 131, 13, 2, 6
+        _, _, alpha, beta = DSA.gen_public_key(p, q, g, private_key)
+        group = ModPGroup(p, alpha, q)
+        self.assertEqual(DSA.gen_public_key_group(group, private_key), beta)
+        self.assertEqual(DSA.gen_signature_group(group, private_key, 27, 4), (6, 6))
+        self.assertTrue(DSA.verify_group(group, beta, (6, 6), 27))
+        with self.assertRaises(ValueError):
+            DSA.gen_public_key_group(ModPGroup(131, 2), private_key)
+
+        # ECDSA
+        private_key = random.randrange(1, P256.order)
+        public_key = DSA.gen_public_key_group(P256, private_key)
+        for message_hash in [0, 1, random.getrandbits(256)]:
+            signature = DSA.gen_signature_group(P256, private_key, message_hash)
+            self.assertTrue(DSA.verify_group(P256, public_key, signature, message_hash))
+            self.assertFalse(DSA.verify_group(P256, public_key, signature, message_hash + 1))
+            self.assertFalse(DSA.verify_group(P256, public_key, (0, signature[1]), message_hash))
+            self.assertFalse(DSA.verify_group(P256, P256.generator, signature, message_hash))
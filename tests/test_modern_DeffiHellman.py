@@ -1,5 +1,6 @@
 from unittest import TestCase
 from modern.DeffiHellman import *
+from util.group import ModPGroup, P256
 
 
 class TestDeffiHellman(TestCase):
@@ -16,4 +17,11 @@ class TestDeffiHellman(TestCase):
         pk_a = 7
         pk_b = 11
         k = DeffiHellman.gen_shared_key(g, p, pk_a, pk_b)
-        self.assertEqual(k, 504)
\ No newline at end of file
+        self.assertEqual(k, 504)
+
+    def test_gen_shared_key_group(self):
+        self.assertEqual(DeffiHellman.gen_shared_key_group(ModPGroup(541, 3), 5, 12), 352)
+
+        pk_a, pk_b = 123456789, 987654321
+        k = DeffiHellman.gen_shared_key_group(P256, pk_a, pk_b)
+        self.assertEqual(k, P256.exp(P256.generator, pk_a * pk_b))
@@ -1,5 +1,7 @@
 from unittest import TestCase
 from modern.ElGamal import *
+from util.group import ModPGroup, P256
+import random
 
 
 class TestElGamal(TestCase):
@@ -52,8 +54,15 @@ class TestElGamal(TestCase):
         block_size = 2
 
         # Empty
-        _, c2 = ElGamal.encrypt(pub_key, block_size, "")
-        self.assertEqual(c2, b"")
+        c = ElGamal.encrypt(pub_key, block_size, "")
+        self.assertEqual(c[1], b"")
+        self.assertEqual(ElGamal.decrypt(pub_key, private_key, block_size, c), "")
+
+        # Padding is only removed from the last block
+        message = "A\x00\x00\x00B"
+        c = ElGamal.encrypt(pub_key, block_size, message)
+        self.assertEqual(len(c[1]), 12)
+        self.assertEqual(message, ElGamal.decrypt(pub_key, private_key, block_size, c))
 
         # Single character
         block_size = 3
@@ -90,3 +99,194 @@ class TestElGamal(TestCase):
         c = ElGamal.encrypt(pub_key, block_size, message)
         msg = ElGamal.decrypt(pub_key, private_key, block_size, c)
         self.assertEqual(message, msg)
+
+    def test_encrypt_decrypt_auto(self):
+        p, g = 3731292319, 14
+        pub_key, private_key = ElGamal.gen_keys(p, g)
+
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        c1, c2 = ElGamal.encrypt(pub_key, 'auto', message, k=12345)
+        self.assertEqual(c2[:2], b'\x00\x03')
+        self.assertEqual((c1, c2[2:]), ElGamal.encrypt(pub_key, 3, message, k=12345))
+        self.assertEqual(message, ElGamal.decrypt(pub_key, private_key, 'auto', (c1, c2)))
+
+        c = ElGamal.encrypt(pub_key, 'auto', "")
+        self.assertEqual("", ElGamal.decrypt(pub_key, private_key, 'auto', c))
+
+        with self.assertRaises(ValueError):
+            ElGamal.decrypt(pub_key, private_key, 'auto', (c1, b''))
+        with self.assertRaises(ValueError):
+            ElGamal.decrypt(pub_key, private_key, 'auto', (c1, b'\x00\x04' + c2[2:]))
+
+        pub_key, private_key = ElGamal.gen_keys(251, 6)
+        with self.assertRaises(ValueError):
+            ElGamal.encrypt(pub_key, 'auto', message)
+
+    def test_large_group(self):
+        # Large enough for the fixed base tables (see fixed_base_pow())
+        p, q, g = random_schnorr_group(512, 160)
+        pub_key, private_key = ElGamal.gen_keys(p, g)
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+" * 5
+        for _ in range(5):
+            c = ElGamal.encrypt(pub_key, 'auto', message)
+            self.assertEqual(message, ElGamal.decrypt(pub_key, private_key, 'auto', c))
+            c = ElGamal.encrypt__(pub_key, message[:60])
+            self.assertEqual(message[:60], ElGamal.decrypt__(pub_key, private_key, c))
+
+    def test_context(self):
+        p, g = 3731292319, 14
+        pub_key, private_key = ElGamal.gen_keys(p, g)
+
+        with self.assertRaises(ValueError):
+            ElGamalContext((p + 1, g, pub_key[2]))
+        with self.assertRaises(ValueError):
+            ElGamalContext((p, p, pub_key[2]))
+        with self.assertRaises(ValueError):
+            ElGamalContext(pub_key, private_key + 1)
+        with self.assertRaises(ValueError):
+            ElGamalContext(pub_key).decrypt(3, (1, b''))
+
+        context = ElGamalContext(pub_key, private_key)
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        for block_size in [1, 3, 'auto']:
+            # Same format as ElGamal.encrypt()
+            c = context.encrypt(block_size, message, k=12345)
+            self.assertEqual(c, ElGamal.encrypt(pub_key, block_size, message, k=12345))
+            self.assertEqual(message, context.decrypt(block_size, c))
+            self.assertEqual(message, ElGamal.decrypt(pub_key, private_key, block_size, c))
+            c = context.encrypt(block_size, message)
+            self.assertEqual(message, context.decrypt(block_size, c))
+
+        with self.assertRaises(ValueError):
+            context.encrypt(4, message)
+
+    def test_pool(self):
+        p, g = 3731292319, 14
+        pub_key, private_key = ElGamal.gen_keys(p, g)
+
+        with self.assertRaises(ValueError):
+            ElGamalPool(pub_key, size=0)
+        with self.assertRaises(ValueError):
+            ElGamalPool(pub_key, size=4, low_water=4)
+
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        with ElGamalPool(pub_key, size=8, low_water=2) as pool:
+            pairs = [pool.get() for _ in range(20)]
+            for c1, hk in pairs:
+                # hk = c1^x
+                self.assertEqual(hk, pow(c1, private_key, p))
+            self.assertEqual(len(set(pairs)), len(pairs))
+            self.assertLessEqual(len(pool), 8)
+
+            for block_size in [3, 'auto']:
+                c = ElGamal.encrypt(pub_key, block_size, message, pool=pool)
+                self.assertEqual(message, ElGamal.decrypt(pub_key, private_key, block_size, c))
+                c = ElGamalContext(pub_key).encrypt(block_size, message, pool=pool)
+                self.assertEqual(message, ElGamal.decrypt(pub_key, private_key, block_size, c))
+            c = ElGamal.encrypt__(pub_key, "abc", pool=pool)
+            self.assertEqual("abc", ElGamal.decrypt__(pub_key, private_key, c))
+
+            # k takes precedence over the pool
+            self.assertEqual(ElGamal.encrypt(pub_key, 3, message, k=12345, pool=pool),
+                             ElGamal.encrypt(pub_key, 3, message, k=12345))
+
+            other_key, _ = ElGamal.gen_keys(p, g)
+            if other_key != pub_key:
+                with self.assertRaises(ValueError):
+                    ElGamal.encrypt(other_key, 3, message, pool=pool)
+
+        # Ephemeral pairs don't depend on the state of 'random'
+        state = random.getstate()
+        random.seed(1)
+        first = ElGamalPool(pub_key, size=1)
+        random.seed(1)
+        second = ElGamalPool(pub_key, size=1)
+        self.assertNotEqual(first.get(), second.get())
+        first.close()
+        second.close()
+        random.setstate(state)
+
+        # Closed pool still falls back to computing pairs
+        self.assertFalse(pool._thread.is_alive())
+        while len(pool):
+            pool.get()
+        c1, hk = pool.get()
+        self.assertEqual(hk, pow(c1, private_key, p))
+
+    def test_decrypt_batch(self):
+        p, g = 3731292319, 14
+        pub_key, private_key = ElGamal.gen_keys(p, g)
+
+        messages = ["a", "bc", "xyz", "", "!@#"] * 7
+        ciphertexts = [ElGamal.encrypt__(pub_key, m) for m in messages]
+        self.assertEqual(messages, ElGamal.decrypt_batch(pub_key, private_key, ciphertexts))
+        self.assertEqual(messages, ElGamal.decrypt_batch(pub_key, private_key, ciphertexts, workers=2))
+        self.assertEqual(ElGamal.decrypt_batch(pub_key, private_key, []), [])
+
+        numbers = [0, 1, 2, p - 1, 123456789]
+        ciphertexts = [ElGamal.encrypt__(pub_key, str(m), use_bytes=False) for m in numbers]
+        self.assertEqual([str(m) for m in numbers],
+                         ElGamal.decrypt_batch(pub_key, private_key, ciphertexts, use_bytes=False))
+
+        # s = 0 has no inverse
+        with self.assertRaises(ValueError):
+            ElGamal.decrypt_batch(pub_key, private_key, ciphertexts + [(0, 1)])
+
+        p, q, g = random_schnorr_group(512, 160)
+        pub_key, private_key = ElGamal.gen_keys(p, g)
+        ciphertexts = [ElGamal.encrypt__(pub_key, m) for m in messages]
+        self.assertEqual(messages, ElGamal.decrypt_batch(pub_key, private_key, ciphertexts, workers=3))
+        self.assertEqual([ElGamal.decrypt__(pub_key, private_key, c) for c in ciphertexts],
+                         ElGamal.decrypt_batch(pub_key, private_key, ciphertexts))
+
+    def test_group(self):
+        p, q, g = random_schnorr_group(512, 160)
+        message = "abcdefghijklmnopqrstuvwxyz0123"
+        for group in [ModPGroup(3731292319, 14), ModPGroup(p, g, q), P256]:
+            pub_key, private_key = ElGamal.gen_keys_group(group)
+            c = ElGamal.encrypt_group(group, pub_key, message[:3])
+            self.assertEqual(message[:3], ElGamal.decrypt_group(group, private_key, c))
+            c = ElGamal.encrypt_group(group, pub_key, "12345", use_bytes=False)
+            self.assertEqual("12345", ElGamal.decrypt_group(group, private_key, c, use_bytes=False))
+
+        # Same cipher as encrypt__() over ModPGroup
+        pub_key, private_key = ElGamal.gen_keys(3731292319, 14)
+        group = ModPGroup(3731292319, 14)
+        self.assertEqual(ElGamal.gen_keys_group(group, private_key), (pub_key[2], private_key))
+        self.assertEqual(ElGamal.encrypt_group(group, pub_key[2], "abc", k=99), ElGamal.encrypt__(pub_key, "abc", k=99))
+
+        pub_key, private_key = ElGamal.gen_keys_group(P256)
+        c = ElGamal.encrypt_group(P256, pub_key, message)
+        self.assertEqual(message, ElGamal.decrypt_group(P256, private_key, c))
+        self.assertEqual(message, ElGamal.decrypt_group(P256, private_key, tuple(P256.decode(P256.encode(x))
+                                                                                 for x in c)))
+
+    def test_exp(self):
+        p, q, g = random_schnorr_group(512, 160)
+        pub_key, private_key = ElGamal.gen_keys(p, g)
+        table = BabyStepTable(g, p, 10000)
+
+        counters = [random.randrange(10) for _ in range(200)]
+        ciphertexts = [ElGamal.encrypt_exp(pub_key, m) for m in counters]
+        for m, c in zip(counters[:10], ciphertexts):
+            self.assertEqual(ElGamal.decrypt_exp(pub_key, private_key, c, table), m)
+
+        total = ElGamal.aggregate(pub_key, ciphertexts)
+        self.assertEqual(ElGamal.decrypt_exp(pub_key, private_key, total, table), sum(counters))
+        self.assertEqual(total, ElGamal.aggregate(pub_key, iter(ciphertexts)))
+        self.assertEqual(ElGamal.decrypt_exp(pub_key, private_key, ElGamal.aggregate(pub_key, []), table), 0)
+
+        c = ElGamal.add(pub_key, ciphertexts[0], ElGamal.encrypt_exp(pub_key, 9999 - counters[0]))
+        self.assertEqual(ElGamal.decrypt_exp(pub_key, private_key, c, table), 9999)
+        c = ElGamal.add(pub_key, c, ElGamal.encrypt_exp(pub_key, 1))
+        with self.assertRaises(ValueError):
+            ElGamal.decrypt_exp(pub_key, private_key, c, table)
+
+        with self.assertRaises(ValueError):
+            ElGamal.encrypt_exp(pub_key, -1)
+        with self.assertRaises(ValueError):
+            ElGamal.decrypt_exp(pub_key, private_key, total, BabyStepTable(g + 1, p, 100))
+
+        with ElGamalPool(pub_key, size=4) as pool:
+            c = ElGamal.encrypt_exp(pub_key, 42, pool=pool)
+            self.assertEqual(ElGamal.decrypt_exp(pub_key, private_key, c, table), 42)
@@ -1,7 +1,10 @@
 from unittest import TestCase
 from modern.RSA import *
-from math import gcd
+from math import gcd, prod
 import time
+import io
+import random
+import os
 
 
 class TestRSA(TestCase):
@@ -53,6 +56,227 @@ class TestRSA(TestCase):
         end = time.time()
         print("large prime private key: " + str(d) + ", time taken: " + str(end - start))
 
+    def test_gen_private_key_crt(self):
+        p, q, e = 7, 29, 149
+        n, d, crt = RSA.gen_private_key_crt(p, q, e)
+        self.assertEqual((n, d), (203, 53))
+        self.assertEqual(crt, (7, 29, 53 % 6, 53 % 28, 1))
+
+        with self.assertRaises(ValueError):
+            RSA.gen_crt_params(7, 7, 5)
+
+        # CRT decryption matches c^d mod n for every c
+        for c in range(n):
+            self.assertEqual(RSA._decrypt_int(c, n, d, crt), pow(c, d, n))
+
+        # q > p
+        crt = RSA.gen_crt_params(q, p, d)
+        for c in range(n):
+            self.assertEqual(RSA._decrypt_int(c, n, d, crt), pow(c, d, n))
+
+    def test_decrypt_crt(self):
+        p, q = 45845791, 3731292319
+        n, e = RSA.gen_public_key(p, q)
+        n, d, crt = RSA.gen_private_key_crt(p, q, e)
+
+        message = "1234567"
+        c = RSA.encrypt__(n, e, message)
+        self.assertEqual(message, RSA.decrypt__(n, d, c, crt=crt))
+
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        c = RSA.encrypt(n, e, 7, message)
+        self.assertEqual(message, RSA.decrypt(n, d, 7, c, crt))
+        self.assertEqual(message, RSA.decrypt(n, d, 7, c))
+
+        c = RSA.encrypt_32bit(n, e, message)
+        self.assertEqual(message, RSA.decrypt_32bit(n, d, c, crt))
+
+        # stress test
+        p, q = random_prime(512), random_prime(512)
+        n, e = RSA.gen_public_key(p, q)
+        n, d, crt = RSA.gen_private_key_crt(p, q, e)
+        message = "MFwwDQYJKoZIhvcNAQEBBQADSwAwSAJBAKgRE+tUN2AVZJ5S/eHr/B/gdQreYX8OqVAeRJR0CgxIvDx3qFrMkjk2odflcV32ZuPv20fbW8MaBpUYEsoHSwECAwEAAQ==" * 20
+        c = RSA.encrypt(n, e, 127, message)
+        start = time.time()
+        self.assertEqual(message, RSA.decrypt(n, d, 127, c))
+        mid = time.time()
+        self.assertEqual(message, RSA.decrypt(n, d, 127, c, crt))
+        end = time.time()
+        print("1024 bit decryption: " + str(mid - start) + ", with CRT: " + str(end - mid))
+
+    def test_key_objects(self):
+        p, q = 45845791, 3731292319
+        n, e = RSA.gen_public_key(p, q)
+        private_key = RSAPrivateKey.from_primes(p, q, e)
+        public_key = private_key.public_key
+
+        self.assertEqual(tuple(public_key), (n, e))
+        self.assertEqual(tuple(private_key), RSA.gen_private_key(p, q, e))
+        self.assertEqual(private_key.crt, RSA.gen_crt_params(p, q, private_key.d))
+        self.assertEqual(public_key.byte_length, 8)
+        self.assertEqual(public_key.max_block_size, 7)
+        with self.assertRaises(AttributeError):
+            public_key.x = 1
+
+        with self.assertRaises(ValueError):
+            RSAPrivateKey.from_primes(12, 19, 5)
+        with self.assertRaises(ValueError):
+            RSAPrivateKey(n, private_key.d).public_key
+
+        # n is too small. n >= 2^(64)
+        with self.assertRaises(ValueError):
+            RSA.encrypt_key(public_key, 8, "")
+
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        c = RSA.encrypt_key(public_key, 7, message)
+        self.assertEqual(c, RSA.encrypt(n, e, 7, message))
+        self.assertEqual(message, RSA.decrypt_key(private_key, 7, c))
+        self.assertEqual(c, RSA.encrypt_key(public_key, block_size=7, message=message))
+        self.assertEqual(message, RSA.decrypt_key(key=private_key, block_size=7, cipher=c))
+
+        # The tuple signatures are unchanged, a missing argument is an error
+        with self.assertRaises(TypeError):
+            RSA.encrypt(n, e, 7)
+        with self.assertRaises(TypeError):
+            RSA.decrypt(n, private_key.d, 7)
+        with self.assertRaises(TypeError):
+            RSA.encrypt_stream(n, e, 7)
+
+        # keys without CRT parameters
+        n, d = private_key
+        self.assertEqual(message, RSA.decrypt_key(RSAPrivateKey(n, d), 7, c))
+
+        c = RSA.encrypt_32bit_key(public_key, message)
+        self.assertEqual(c, RSA.encrypt_32bit(n, e, message))
+        self.assertEqual(message, RSA.decrypt_32bit_key(private_key, c))
+
+    def test_generate(self):
+        with self.assertRaises(ValueError):
+            RSA.generate(15)
+        with self.assertRaises(ValueError):
+            RSA.generate(64, 4)
+
+        # phi < e
+        with self.assertRaises(ValueError):
+            RSA.generate(16, 65537)
+
+        for bits in [16, 17, 64, 99]:
+            for e in [3, 5, 65537] if bits > 32 else [3, 5]:
+                key = RSA.generate(bits, e)
+                p, q, dp, dq, q_inv = key.crt
+                self.assertEqual(key.n.bit_length(), bits)
+                self.assertEqual(key.public_key.e, e)
+                self.assertTrue(is_prime(p) and is_prime(q))
+                self.assertEqual((key.d * e) % ((p - 1) * (q - 1)), 1)
+
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        for bits in [1024, 2048]:
+            start = time.time()
+            key = RSA.generate(bits)
+            end = time.time()
+            self.assertEqual(key.n.bit_length(), bits)
+            c = RSA.encrypt_key(key.public_key, 32, message)
+            self.assertEqual(message, RSA.decrypt_key(key, 32, c))
+            print(str(bits) + "-bit key generation, time taken: " + str(end - start))
+
+        key = RSA.generate(1024, workers=2)
+        self.assertEqual(key.n.bit_length(), 1024)
+
+    def test_multi_prime(self):
+        p, q, r, s, e = 11, 13, 17, 19, 7
+        n, d, crt = RSA.gen_private_key_crt(p, q, e, [r, s])
+        self.assertEqual(n, p * q * r * s)
+        self.assertEqual((d * e) % (10 * 12 * 16 * 18), 1)
+        self.assertEqual(crt[5:], ((r, d % 16, mod_inverse(p * q % r, r)), (s, d % 18, mod_inverse(p * q * r % s, s))))
+        for c in range(n):
+            self.assertEqual(RSA._decrypt_int(c, n, d, crt), pow(c, d, n))
+
+        # Not prime
+        with self.assertRaises(ValueError):
+            RSA.gen_private_key_crt(p, q, e, [15])
+        # Not distinct
+        with self.assertRaises(ValueError):
+            RSA.gen_private_key_crt(p, q, e, [p])
+        # e not coprime
+        with self.assertRaises(ValueError):
+            RSA.gen_private_key_crt(p, q, 5, [r])
+
+        with self.assertRaises(ValueError):
+            RSA.generate(64, primes=1)
+        with self.assertRaises(ValueError):
+            RSA.generate(31, 3, primes=4)
+
+        for bits, primes in [(32, 4), (100, 3), (1024, 3), (1025, 4)]:
+            key = RSA.generate(bits, 3 if bits < 64 else 65537, primes=primes)
+            factors = [key.crt[0], key.crt[1]] + [r_i for r_i, _, _ in key.crt[5:]]
+            self.assertEqual(len(factors), primes)
+            self.assertEqual(prod(factors), key.n)
+            self.assertEqual(key.n.bit_length(), bits)
+
+        # The block format is the same as for 2 primes
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+" * 10
+        c = RSA.encrypt_key(key.public_key, 'auto', message)
+        self.assertEqual(message, RSA.decrypt_key(key, 'auto', c))
+        n, d = key
+        self.assertEqual(message, RSA.decrypt(n, d, 'auto', c))
+
+        # stress test
+        for primes in [2, 3]:
+            key = RSA.generate(3072, primes=primes)
+            c = RSA.encrypt_key(key.public_key, 'auto', message)
+            start = time.time()
+            self.assertEqual(message, RSA.decrypt_key(key, 'auto', c))
+            end = time.time()
+            print("3072 bit decryption, " + str(primes) + " primes: " + str(end - start))
+
+    def test_decrypt_batch(self):
+        key = RSAPrivateKey.from_primes(45845791, 3731292319, 65537)
+        public_keys = RSA.gen_batch_public_keys(key, 6)
+        exponents = [pk.e for pk in public_keys]
+        self.assertEqual(len(set(exponents)), 6)
+        for pk in public_keys:
+            self.assertEqual(pk.n, key.n)
+            self.assertEqual(gcd(pk.e, RSA._phi(key)), 1)
+            self.assertTrue(is_prime(pk.e))
+
+        # Uneven number of ciphertexts per exponent, the last batches are small
+        messages = []
+        ciphertexts = []
+        for i in range(40):
+            pk = public_keys[i % 6 if i < 30 else i % 2]
+            message = "msg" + str(i)
+            messages.append(message)
+            ciphertexts.append((pk.e, RSA.encrypt__(pk.n, pk.e, message)))
+        self.assertEqual(RSA.decrypt_batch(key, ciphertexts), messages)
+
+        # Integers, including ones that are not coprime to n
+        values = ["0", "1", "45845791", "12345", "999999"]
+        ciphertexts = [(pk.e, RSA.encrypt__(pk.n, pk.e, m, False)) for pk, m in zip(public_keys, values)]
+        self.assertEqual(RSA.decrypt_batch(key, ciphertexts, False), values)
+
+        self.assertEqual(RSA.decrypt_batch(key, []), [])
+
+        # Exponents that are not pairwise coprime
+        with self.assertRaises(ValueError):
+            RSA.decrypt_batch(key, [(3, 5), (9, 7)])
+        # Key without the factors of n
+        with self.assertRaises(ValueError):
+            RSA.decrypt_batch(RSAPrivateKey(key.n, key.d), ciphertexts)
+
+        # stress test
+        key = RSA.generate(2048)
+        public_keys = RSA.gen_batch_public_keys(key, 8)
+        values = [str(random.randrange(1 << 256)) for _ in range(64)]
+        ciphertexts = [(public_keys[i % 8].e, pow(int(m), public_keys[i % 8].e, key.n)) for i, m in enumerate(values)]
+        start = time.time()
+        self.assertEqual(RSA.decrypt_batch(key, ciphertexts, False), values)
+        private_keys = {pk.e: RSAPrivateKey.from_primes(key.crt[0], key.crt[1], pk.e) for pk in public_keys}
+        mid = time.time()
+        self.assertEqual([RSA.decrypt__(private_keys[e].n, private_keys[e].d, c, False, private_keys[e].crt)
+                          for e, c in ciphertexts], values)
+        end = time.time()
+        print("2048 bit batch decryption: " + str(mid - start) + ", one by one with CRT: " + str(end - mid))
+
     def test_encrypt___decrypt__(self):
         p, q = 45845791, 3731292319
         n, e = RSA.gen_public_key(p, q)
@@ -87,6 +311,13 @@ class TestRSA(TestCase):
 
         # Empty
         self.assertEqual(RSA.encrypt(n, e, block_size, ""), b"")
+        self.assertEqual(RSA.decrypt(n, d, block_size, b""), "")
+
+        # Padding is only removed from the last block
+        message = "ABCDEF\x00\x00G"
+        c = RSA.encrypt(n, e, block_size, message)
+        self.assertEqual(len(c), 16)
+        self.assertEqual(message, RSA.decrypt(n, d, block_size, c))
 
         # Single character
         message = "A"
@@ -125,6 +356,110 @@ class TestRSA(TestCase):
         msg = RSA.decrypt(n, d, block_size, c)
         self.assertEqual(message, msg)
 
+    def test_encrypt_decrypt_stream(self):
+        p, q = 45845791, 3731292319
+        n, e = RSA.gen_public_key(p, q)
+        n, d, crt = RSA.gen_private_key_crt(p, q, e)
+
+        # n is too small. n >= 2^(64)
+        with self.assertRaises(ValueError):
+            RSA.encrypt_stream(n, e, 8, [b""])
+
+        # Empty data is a single padding block
+        cipher = list(RSA.encrypt_stream(n, e, 7, []))
+        self.assertEqual(len(cipher), 1)
+        self.assertEqual(b''.join(RSA.decrypt_stream(n, d, 7, cipher)), b'')
+        with self.assertRaises(ValueError):
+            list(RSA.decrypt_stream(n, d, 7, []))
+
+        # Same output regardless of how the input is chunked
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        data = message.encode('utf-8')
+        expected = b''.join(RSA.encrypt_stream(n, e, 7, [data]))
+        self.assertEqual(len(expected), (len(data) // 7 + 1) * 8)
+        for size in [1, 3, 7, 8, 50]:
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            self.assertEqual(b''.join(RSA.encrypt_stream(n, e, 7, chunks)), expected)
+            cipher_chunks = [expected[i:i + size] for i in range(0, len(expected), size)]
+            self.assertEqual(b''.join(RSA.decrypt_stream(n, d, 7, cipher_chunks, crt)), data)
+
+        # Blocks are yielded as they are produced
+        blocks = RSA.encrypt_stream(n, e, 7, iter([data]))
+        self.assertEqual(next(blocks), expected[:8])
+
+        # Trailing zero bytes and padding bytes belong to the data
+        for data in [b'abc' + b'\x00' * 1024, b'abcdefg' + b'\x00' * 7, b'\x00' * 7, b'\x80', b'abc\x80\x00']:
+            cipher = b''.join(RSA.encrypt_stream(n, e, 7, [data]))
+            self.assertEqual(b''.join(RSA.decrypt_stream(n, d, 7, [cipher])), data)
+
+        # Binary data from file objects
+        key = RSAPrivateKey.from_primes(p, q, e)
+        for data in [os.urandom(10000), os.urandom(10000) + bytes(7), os.urandom(7 * 1000)]:
+            cipher = io.BytesIO()
+            for block in RSA.encrypt_stream_key(key.public_key, 7, io.BytesIO(data)):
+                cipher.write(block)
+            self.assertEqual(len(cipher.getvalue()), (len(data) // 7 + 1) * 8)
+            cipher.seek(0)
+            self.assertEqual(b''.join(RSA.decrypt_stream_key(key, 7, cipher)), data)
+
+        # Truncated cipher
+        with self.assertRaises(ValueError):
+            list(RSA.decrypt_stream_key(key, 7, [expected[:-1]]))
+
+    def test_encrypt_decrypt_workers(self):
+        p, q = 45845791, 3731292319
+        n, e = RSA.gen_public_key(p, q)
+        n, d, crt = RSA.gen_private_key_crt(p, q, e)
+
+        for message in ["", "A", "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+" * 3]:
+            expected = RSA.encrypt(n, e, 7, message)
+            for workers in [1, 2, 3]:
+                c = RSA.encrypt(n, e, 7, message, workers=workers)
+                self.assertEqual(c, expected)
+                self.assertEqual(message, RSA.decrypt(n, d, 7, c, crt, workers=workers))
+
+        with self.assertRaises(ValueError):
+            RSA.decrypt(n, d, 7, expected[:-1], workers=2)
+
+        # stress test, reusing one pool
+        key = RSA.generate(1024)
+        message = "MFwwDQYJKoZIhvcNAQEBBQADSwAwSAJBAKgRE+tUN2AVZJ5S/eHr/B/gdQreYX8OqVAeRJR0CgxIvDx3qFrMkjk2odflcV32ZuPv20fbW8MaBpUYEsoHSwECAwEAAQ==" * 200
+        with ProcessPoolExecutor(2) as executor:
+            c = RSA.encrypt_key(key.public_key, 127, message, executor=executor)
+            self.assertEqual(c, RSA.encrypt_key(key.public_key, 127, message))
+            start = time.time()
+            self.assertEqual(message, RSA.decrypt_key(key, 127, c, workers=2, executor=executor))
+            end = time.time()
+        print("1024 bit decryption with 2 workers: " + str(end - start))
+
+    def test_encrypt_decrypt_auto(self):
+        p, q = 45845791, 3731292319
+        n, e = RSA.gen_public_key(p, q)
+        n, d, crt = RSA.gen_private_key_crt(p, q, e)
+
+        message = "abcdefghijklmnopqrstuvwxyz1234567890!@#$%^&*()_+"
+        c = RSA.encrypt(n, e, 'auto', message)
+        self.assertEqual(c[:2], b'\x00\x07')
+        self.assertEqual(c[2:], RSA.encrypt(n, e, 7, message))
+        self.assertEqual(message, RSA.decrypt(n, d, 'auto', c))
+        self.assertEqual(message, RSA.decrypt(n, d, 'auto', c, crt, workers=2))
+        self.assertEqual(c, RSA.encrypt(n, e, 'auto', message, workers=2))
+        self.assertEqual("", RSA.decrypt(n, d, 'auto', RSA.encrypt(n, e, 'auto', "")))
+
+        with self.assertRaises(ValueError):
+            RSA.decrypt(n, d, 'auto', b'')
+        with self.assertRaises(ValueError):
+            RSA.decrypt(n, d, 'auto', b'\x00\x08' + c[2:])
+        with self.assertRaises(ValueError):
+            RSA.encrypt(255, 3, 'auto', message)
+
+        key = RSA.generate(2048)
+        message = "MFwwDQYJKoZIhvcNAQEBBQADSwAwSAJBAKgRE+tUN2AVZJ5S/eHr/B/gdQreYX8OqVAeRJR0CgxIvDx3qFrMkjk2odflcV32ZuPv20fbW8MaBpUYEsoHSwECAwEAAQ=="
+        c = RSA.encrypt_key(key.public_key, 'auto', message)
+        # 255 bytes per block instead of 4
+        self.assertEqual(len(c), 2 + 256)
+        self.assertEqual(message, RSA.decrypt_key(key, 'auto', c))
+
     def test_encrypt_decrypt_32bit(self):
         p, q = 45845791, 3731292319
         n, e = RSA.gen_public_key(p, q)
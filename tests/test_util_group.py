@@ -0,0 +1,102 @@
+from unittest import TestCase
+from util.group import *
+import random
+
+# y^2 = x^3 + x + 6 mod 1021 has 991 points (prime), p = 1 mod 4
+TOY = (1021, 1, 6, (2, 4), 991)
+
+
+class TestGroup(TestCase):
+
+    def naive_exp(self, group, a, k):
+        result = group.identity
+        for _ in range(k):
+            result = group.multiply(result, a)
+        return result
+
+    def test_wnaf(self):
+        for w in [2, 3, 5]:
+            for k in list(range(100)) + [random.getrandbits(256) for _ in range(20)]:
+                digits = wnaf(k, w)
+                self.assertEqual(sum(d << i for i, d in enumerate(digits)), k)
+                for i, d in enumerate(digits):
+                    self.assertTrue(d == 0 or (d % 2 == 1 and abs(d) < 1 << (w - 1)))
+                    if d:
+                        self.assertFalse(any(digits[i + 1:i + w]))
+
+    def test_mod_p_group(self):
+        with self.assertRaises(ValueError):
+            ModPGroup(100, 3)
+        with self.assertRaises(ValueError):
+            ModPGroup(101, 101)
+        with self.assertRaises(ValueError):
+            ModPGroup(101, 2, 7)
+
+        group = ModPGroup(1019, 2)
+        self.assertEqual(group.order, 1018)
+        for k in [0, 1, 2, 500, 1018, 5000]:
+            self.assertEqual(group.exp(group.generator, k), pow(2, k, 1019))
+        self.assertEqual(group.multiply(group.inverse(5), 5), group.identity)
+        self.assertEqual(group.decode(group.encode(1018)), 1018)
+        with self.assertRaises(ValueError):
+            group.decode(group.encode(0))
+        self.assertEqual(group.extract(group.embed(77)), 77)
+        with self.assertRaises(ValueError):
+            group.embed(1019)
+
+    def test_curve_toy(self):
+        p, a, b, g, n = TOY
+        with self.assertRaises(ValueError):
+            EllipticCurveGroup(p, a, b, (2, 5), n)
+        with self.assertRaises(ValueError):
+            EllipticCurveGroup(p, -3, 2, g, n)
+
+        for window, width in [(1, 2), (4, 5), (3, 3)]:
+            group = EllipticCurveGroup(p, a, b, g, n, window, width)
+            points = [group.identity]
+            for _ in range(n):
+                points.append(group.multiply(points[-1], g))
+            self.assertIsNone(points[n])
+            self.assertEqual(len(set(points[:n])), n)
+
+            h = points[123]
+            for k in list(range(2 * n + 3)) + [-1, -n]:
+                self.assertEqual(group.exp(g, k), points[k % n])
+                self.assertEqual(group.exp(h, k), points[123 * k % n])
+            self.assertIsNone(group.exp(None, 5))
+
+        for point in points:
+            self.assertTrue(group.is_on_curve(point))
+            self.assertEqual(group.decode(group.encode(point)), point)
+            self.assertIsNone(group.multiply(point, group.inverse(point)))
+        with self.assertRaises(ValueError):
+            group.decode(b'\x04' + bytes(2))
+
+        for m in range(3):
+            self.assertEqual(group.extract(group.embed(m)), m)
+        with self.assertRaises(ValueError):
+            group.embed(p)
+
+    def test_p256(self):
+        group = P256
+        g = group.generator
+        self.assertIsNone(group.exp(g, group.order))
+        # 2G, from the published P-256 test vectors
+        self.assertEqual(group.exp(g, 2), (0x7cf27b188d034f7e8a52380304b51ac3c08969e277f21b35a60b48fc47669978,
+                                           0x07775510db8ed040293d9ac69f7430dbba7dade63ce982299e04b79d227873d1))
+
+        h = group.exp(g, random.randrange(1, group.order))
+        for _ in range(5):
+            k1, k2 = random.randrange(group.order), random.randrange(group.order)
+            # Fixed-base, wNAF and the group law agree
+            self.assertEqual(group.multiply(group.exp(g, k1), group.exp(g, k2)), group.exp(g, k1 + k2))
+            self.assertEqual(group.multiply(group.exp(h, k1), group.exp(h, k2)), group.exp(h, k1 + k2))
+            self.assertEqual(group.exp(group.exp(g, k1), k2), group.exp(g, k1 * k2))
+            point = group.exp(h, k1)
+            self.assertTrue(group.is_on_curve(point))
+            self.assertEqual(len(group.encode(point)), 33)
+            self.assertEqual(group.decode(group.encode(point)), point)
+        self.assertEqual(self.naive_exp(group, h, 20), group.exp(h, 20))
+
+        message = int.from_bytes(b'abcdefghijklmnopqrstuvwxyz0123', 'big')
+        self.assertEqual(group.extract(group.embed(message)), message)
@@ -1,7 +1,15 @@
 from unittest import TestCase
 from util.math import *
+import util.math as math_module
 import time
+import random
+import sys
 import math
+import os
+import json
+import multiprocessing
+import tempfile
+import numpy as np
 
 
 class Test(TestCase):
@@ -120,6 +128,95 @@ class Test(TestCase):
         a_inv = mod_inverse(a, p)
         print("mod inverse of mini-Goldilocks prime: " + str(a_inv))
 
+    def test_batch_mod_inverse(self):
+        self.assertEqual(batch_mod_inverse([], 26), [])
+        self.assertEqual(batch_mod_inverse([11], 26), [19])
+        self.assertEqual(batch_mod_inverse([0], 1), [0])
+
+        values = [3, 5, 7, 1, 11, 25]
+        self.assertEqual(batch_mod_inverse(iter(values), 26), [mod_inverse(a, 26) for a in values])
+
+        p = 18446744069414584321
+        values = list(range(1, 1000, 7))
+        self.assertEqual(batch_mod_inverse(values, p), [mod_inverse(a, p) for a in values])
+
+        with self.assertRaises(ValueError):
+            batch_mod_inverse([1, 2], 0)
+        with self.assertRaises(ValueError):
+            batch_mod_inverse([1, 26], 26)
+        with self.assertRaisesRegex(ValueError, r"values\[2\] = 13"):
+            batch_mod_inverse([3, 5, 13, 7], 26)
+
+    def test_gcd_array(self):
+        a = np.array([1, 1, 34, -34, 100, 499017086208, 5988737349])
+        b = np.array([1, 0, -12, -12, 11, 676126714752, 578354589])
+        self.assertEqual(list(gcd_array(a, b)), [math.gcd(int(x), int(y)) for x, y in zip(a, b)])
+        self.assertEqual(list(gcd_array(a, 6)), [math.gcd(int(x), 6) for x in a])
+
+        with self.assertRaises(ValueError):
+            gcd_array(np.array([1, 0]), np.array([1, 0]))
+
+        # big integers fall back to the scalar gcd
+        big = [2 ** 100 * 3, 2 ** 70 * 9]
+        self.assertEqual(list(gcd_array(big, [2 ** 80, 2 ** 71 * 6])), [2 ** 80, 2 ** 70 * 3])
+
+        self.assertEqual(list(is_coprime_array(np.array([9, 10, 11]), 6)), [False, False, True])
+
+    def test_extended_gcd_array(self):
+        a = np.array([1, 1, 161, 28, -45122, 0, 2 ** 61])
+        b = np.array([1, 0, 28, 161, 885, 7, 3 ** 38])
+        g, x, y = extended_gcd_array(a, b)
+        for i in range(len(a)):
+            self.assertEqual((g[i], x[i], y[i]), extended_gcd(int(a[i]), int(b[i])))
+            self.assertEqual(int(a[i]) * int(x[i]) + int(b[i]) * int(y[i]), g[i])
+
+        with self.assertRaises(ValueError):
+            extended_gcd_array([0], [0])
+
+        g, x, y = extended_gcd_array([2 ** 100], [3 ** 70])
+        self.assertEqual((g[0], x[0], y[0]), extended_gcd(2 ** 100, 3 ** 70))
+
+    def test_mod_inverse_array(self):
+        a = np.arange(1, 1000, dtype=np.int64)
+        p = 3731292319
+        self.assertEqual(list(mod_inverse_array(a, p)), [mod_inverse(int(x), p) for x in a])
+
+        # 64-bit unsigned inputs above the int64 range
+        p = 18446744069414584321
+        a = np.array([2, p - 1, 2 ** 63 + 5], dtype=np.uint64)
+        self.assertEqual(list(mod_inverse_array(a, np.uint64(p))), [mod_inverse(int(x), p) for x in a])
+
+        m = np.array([26, 7, 11])
+        self.assertEqual(list(mod_inverse_array(np.array([11, 3, 10]), m)), [19, 5, 10])
+
+        with self.assertRaises(ValueError):
+            mod_inverse_array(np.array([4]), 3)
+        with self.assertRaisesRegex(ValueError, r"a\[1, 0\] = 13"):
+            mod_inverse_array(np.array([[3, 5], [13, 7]]), 26)
+
+    def test_sieve_of_eratosthenes(self):
+        self.assertEqual(sieve_of_eratosthenes(1), [])
+        self.assertEqual(sieve_of_eratosthenes(2), [2])
+        self.assertEqual(sieve_of_eratosthenes(30), [2, 3, 5, 7, 11, 13, 17, 19, 23, 29])
+        self.assertEqual(sieve_of_eratosthenes(1000), Test.primes_first_1000)
+
+        self.assertEqual(small_primes(1000), tuple(Test.primes_first_1000))
+        self.assertEqual(primorial(10), 210)
+
+    def test_has_small_factor(self):
+        for p in Test.primes_first_1000:
+            self.assertFalse(has_small_factor(p))
+
+        for n in Test.non_primes[3:]:
+            self.assertTrue(has_small_factor(n))
+
+        for p in Test.large_primes:
+            self.assertFalse(has_small_factor(p))
+
+        self.assertTrue(has_small_factor(997 * 3731292319))
+        self.assertFalse(has_small_factor(1009 * 3731292319))
+        self.assertTrue(has_small_factor(1009 * 3731292319, 1009))
+
     def test_q1_isprime(self):
 
         for p in Test.primes_first_1000:
@@ -141,6 +238,13 @@ class Test(TestCase):
         for p in Test.non_primes:
             self.assertEqual(q2_isprime(p), False)
 
+        # prefilter disabled
+        for p in Test.primes_first_1000:
+            self.assertEqual(q2_isprime(p, 0), True)
+        for p in Test.non_primes:
+            self.assertEqual(q2_isprime(p, 0), False)
+        self.assertEqual(q2_isprime(1009 * 1013), False)
+
         # Large prime
         start = time.time()
         print("large prime: " + str(q2_isprime(Test.large_primes[0])))
@@ -154,6 +258,12 @@ class Test(TestCase):
         for p in Test.non_primes:
             self.assertEqual(miller_rabin_test(p), False)
 
+        # prefilter disabled
+        for p in Test.primes_first_1000:
+            self.assertEqual(miller_rabin_test(p, bound=0), True)
+        for p in Test.non_primes:
+            self.assertEqual(miller_rabin_test(p, bound=0), False)
+
         # Large primes
         for p in Test.large_primes:
             start = time.time()
@@ -171,6 +281,273 @@ class Test(TestCase):
         print("composite: " + str(x))
         print("time taken: " + str(end - start))
 
+    def test_jacobi_symbol(self):
+        with self.assertRaises(ValueError):
+            jacobi_symbol(3, 4)
+
+        self.assertEqual(jacobi_symbol(1001, 9907), -1)
+        self.assertEqual(jacobi_symbol(19, 45), 1)
+        self.assertEqual(jacobi_symbol(8, 21), -1)
+        self.assertEqual(jacobi_symbol(5, 21), 1)
+        self.assertEqual(jacobi_symbol(15, 21), 0)
+
+    def test_strong_lucas_test(self):
+        for p in Test.large_primes:
+            self.assertTrue(strong_lucas_test(p))
+
+        # strong Lucas pseudoprimes pass the test but are rejected by the strong base-2 test
+        for n in Test.strong_lucas_pseudoprimes:
+            self.assertTrue(strong_lucas_test(n))
+            self.assertFalse(strong_probable_prime_test(n, 2))
+
+        self.assertFalse(strong_lucas_test(1018081))  # 1009^2
+        self.assertFalse(strong_lucas_test(Test.large_composites[0]))
+
+    def test_is_prime(self):
+        for p in Test.primes_first_1000:
+            self.assertTrue(is_prime(p))
+
+        for p in Test.non_primes:
+            self.assertFalse(is_prime(p))
+
+        for p in Test.large_primes:
+            self.assertTrue(is_prime(p))
+
+        for n in Test.large_composites:
+            self.assertFalse(is_prime(n))
+
+        # strong pseudoprimes to several of the smallest prime bases
+        for n in Test.strong_pseudoprimes:
+            self.assertFalse(is_prime(n))
+
+        for n in Test.strong_lucas_pseudoprimes:
+            self.assertFalse(is_prime(n))
+
+        # Mersenne primes/composites above the deterministic limit
+        self.assertTrue(is_prime(2 ** 127 - 1))
+        self.assertTrue(is_prime(2 ** 521 - 1))
+        self.assertFalse(is_prime(2 ** 523 - 1))
+
+    def test_are_prime(self):
+        self.assertEqual(are_prime([]), [])
+        self.assertEqual(are_prime(range(10)), [False, False, True, True, False, True, False, True, False, False])
+        self.assertEqual(are_prime(Test.large_primes), [True] * len(Test.large_primes))
+        self.assertEqual(are_prime(iter(Test.strong_pseudoprimes)), [False] * len(Test.strong_pseudoprimes))
+
+    def test_sieve_window(self):
+        with self.assertRaises(ValueError):
+            sieve_window(10)
+
+        start = 1001
+        survivors = sieve_window(start, 500, 31)
+        for i in range(500):
+            n = start + 2 * i
+            self.assertEqual(i in survivors, all(n % p != 0 for p in small_primes(31)))
+
+        # small primes themselves survive
+        survivors = sieve_window(3, 100)
+        self.assertEqual([3 + 2 * i for i in survivors], Test.primes_first_1000[1:46])
+
+    def test_next_prime(self):
+        self.assertEqual(next_prime(-5), 2)
+        self.assertEqual(next_prime(2), 3)
+        self.assertEqual(next_prime(996), 997)
+        self.assertEqual(next_prime(997), 1009)
+
+        for i in range(len(Test.primes_first_1000) - 1):
+            self.assertEqual(next_prime(Test.primes_first_1000[i]), Test.primes_first_1000[i + 1])
+
+        self.assertEqual(next_prime(2 ** 64), 18446744073709551629)
+        self.assertEqual(next_prime(2 ** 127 - 2), 2 ** 127 - 1)
+
+    def test_random_prime(self):
+        with self.assertRaises(ValueError):
+            random_prime(1)
+
+        for bits in range(2, 64):
+            p = random_prime(bits)
+            self.assertEqual(p.bit_length(), bits)
+            self.assertTrue(q2_isprime(p) if bits < 40 else is_prime(p))
+
+        for bits in [256, 512, 1024]:
+            start = time.time()
+            p = random_prime(bits)
+            end = time.time()
+            self.assertEqual(p.bit_length(), bits)
+            self.assertTrue(miller_rabin_test(p))
+            print(str(bits) + "-bit prime, time taken: " + str(end - start))
+
+        p = random_prime(256, workers=2)
+        self.assertEqual(p.bit_length(), 256)
+        self.assertTrue(miller_rabin_test(p))
+
+        # the losing workers are stopped once the first prime is found
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_random_primes(self):
+        with self.assertRaises(ValueError):
+            random_primes(7, 2)
+
+        primes = random_primes(8, 10)
+        self.assertEqual(len(set(primes)), 10)
+        for p in primes:
+            self.assertEqual(p.bit_length(), 8)
+            self.assertTrue(q1_isprime(p))
+
+        for e in [3, 5, 65537]:
+            for p in random_primes(64, 5, e=e):
+                self.assertEqual(p.bit_length(), 64)
+                self.assertTrue(is_prime(p))
+                self.assertEqual(math.gcd(e, p - 1), 1)
+
+        # more primes than workers
+        primes = random_primes(128, 3, workers=2, e=3)
+        self.assertEqual(len(set(primes)), 3)
+        for p in primes:
+            self.assertTrue(is_prime(p))
+            self.assertEqual(p % 3, 2)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+        # Key primes don't depend on the state of 'random'
+        state = random.getstate()
+        random.seed(1)
+        first = random_primes(128, 2)
+        random.seed(1)
+        self.assertNotEqual(random_primes(128, 2), first)
+        random.setstate(state)
+
+    def test_safe_prime_sieve_window(self):
+        with self.assertRaises(ValueError):
+            safe_prime_sieve_window(10)
+
+        start = 1001
+        survivors = safe_prime_sieve_window(start, 500, 31)
+        for i in range(500):
+            q = start + 2 * i
+            expected = all(q % r != 0 and (2 * q + 1) % r != 0 for r in small_primes(31)[1:])
+            self.assertEqual(i in survivors, expected)
+
+        # q = 5, p = 11 and q = 11, p = 23 are not crossed off as multiples of themselves
+        survivors = safe_prime_sieve_window(3, 10)
+        self.assertEqual([3 + 2 * i for i in survivors], [3, 5, 11])
+
+    def test_random_safe_prime(self):
+        with self.assertRaises(ValueError):
+            random_safe_prime(3)
+
+        for bits in range(4, 64):
+            p, q = random_safe_prime(bits)
+            self.assertEqual(p.bit_length(), bits)
+            self.assertEqual(p, 2 * q + 1)
+            self.assertTrue(is_prime(p) and is_prime(q))
+
+        start = time.time()
+        p, q = random_safe_prime(512)
+        end = time.time()
+        self.assertEqual(p.bit_length(), 512)
+        self.assertTrue(miller_rabin_test(p) and miller_rabin_test(q))
+        print("512-bit safe prime, time taken: " + str(end - start))
+
+        p, q = random_safe_prime(128, workers=2)
+        self.assertEqual(p, 2 * q + 1)
+        self.assertTrue(is_prime(p) and is_prime(q))
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_random_schnorr_group(self):
+        with self.assertRaises(ValueError):
+            random_schnorr_group(64, 64)
+        with self.assertRaises(ValueError):
+            random_schnorr_group(64, 63)
+
+        # p <= SIEVE_BOUND, p must not be crossed off as a multiple of itself
+        for L, N in [(6, 3), (10, 4), (14, 6), (16, 8)]:
+            p, q, g = random_schnorr_group(L, N)
+            self.assertEqual((p.bit_length(), q.bit_length()), (L, N))
+            self.assertTrue(is_prime(p) and is_prime(q))
+            self.assertEqual((p - 1) % q, 0)
+            self.assertNotEqual(g, 1)
+            self.assertEqual(pow(g, q, p), 1)
+
+        start = time.time()
+        p, q, g = random_schnorr_group(1024, 160)
+        end = time.time()
+        self.assertEqual((p.bit_length(), q.bit_length()), (1024, 160))
+        self.assertEqual((p - 1) % q, 0)
+        self.assertEqual(pow(g, q, p), 1)
+        print("(1024, 160) Schnorr group, time taken: " + str(end - start))
+
+    def test_gen_group_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = os.path.join(tmp, 'groups.json')
+
+            p, q, g = gen_safe_prime_group(64, cache=cache)
+            self.assertEqual(p, 2 * q + 1)
+            self.assertTrue(is_primitive_root(g, p))
+            self.assertEqual(gen_safe_prime_group(64, cache=cache), (p, q, g))
+
+            p, q, g = gen_schnorr_group(128, 32, cache=cache)
+            self.assertEqual(pow(g, q, p), 1)
+            self.assertEqual(gen_schnorr_group(128, 32, cache=cache), (p, q, g))
+
+            with open(cache) as f:
+                self.assertEqual(sorted(json.load(f)), ['safe-64', 'schnorr-128-32'])
+
+        p, q, g = gen_safe_prime_group(32)
+        self.assertTrue(is_primitive_root(g, p))
+
+    def test_product_tree_remainder_tree(self):
+        tree = product_tree([3, 5, 7, 11, 13])
+        self.assertEqual(tree, [[3, 5, 7, 11, 13], [15, 77, 13], [1155, 13], [15015]])
+        self.assertEqual(remainder_tree(1000, tree), [1000 % n for n in [3, 5, 7, 11, 13]])
+        self.assertEqual(remainder_tree(1000, tree, square=True), [1000 % (n * n) for n in [3, 5, 7, 11, 13]])
+
+    def test_large_mod(self):
+        for _ in range(300):
+            a = random.getrandbits(random.randrange(1, 60000))
+            b = random.getrandbits(random.randrange(1, 30000)) + 1
+            self.assertEqual(large_mod(a, b), a % b)
+        b = (1 << 20000) - 1
+        for a in [0, b - 1, b, b * b, b * b - 1, (b * b) << 5]:
+            self.assertEqual(large_mod(a, b), a % b)
+
+    def test_batch_gcd(self):
+        self.assertEqual(batch_gcd([]), [])
+        self.assertEqual(batch_gcd([15]), [1])
+
+        moduli = [3 * 5, 7 * 11, 5 * 13, 17 * 19, 11 * 23, 29 * 31]
+        expected = [math.gcd(n, math.prod(moduli[:i] + moduli[i + 1:])) for i, n in enumerate(moduli)]
+        self.assertEqual(expected, [5, 11, 5, 1, 11, 1])
+
+        # chunking must not change the result
+        for chunk_size in [1, 2, 4, 6, 100]:
+            self.assertEqual(batch_gcd(iter(moduli), chunk_size), expected)
+
+        # Large enough for large_mod() to divide near the roots
+        primes = random_primes(256, 70)
+        moduli = [primes[i] * primes[i + 1] for i in range(0, 64, 2)] + [primes[64] * primes[1], primes[65] * primes[66]]
+        expected = [primes[1] if i in (0, 32) else 1 for i in range(len(moduli))]
+        for chunk_size in [1, 5, 64]:
+            self.assertEqual(batch_gcd(moduli, chunk_size), expected)
+
+    def test_find_shared_factors(self):
+        primes = [random_prime(64) for _ in range(12)]
+        moduli = [primes[2 * i] * primes[2 * i + 1] for i in range(6)]
+        moduli.append(primes[0] * primes[3])  # both primes shared
+        moduli.append(primes[4] * random_prime(64))
+        moduli.append(moduli[5])  # duplicate
+
+        weak = find_shared_factors(moduli, chunk_size=3)
+        self.assertEqual([i for i, _, _, _ in weak], [0, 1, 2, 5, 6, 7, 8])
+        for i, n, p, q in weak:
+            self.assertEqual(n, moduli[i])
+            if i in (5, 8):
+                self.assertEqual((p, q), (None, None))
+            else:
+                self.assertEqual(p * q, n)
+                self.assertTrue(1 < p <= q)
+
+        self.assertEqual(find_shared_factors(moduli[:5]), [])
+
     def test_factors(self):
         num, expected = 1, []
         self.assertEqual(expected, factors(num))
@@ -187,6 +564,56 @@ class Test(TestCase):
         num, expected = 763823487, [3, 7, 139, 261673]
         self.assertEqual(expected, factors(num))
 
+        num, expected = 9, [3, 3]
+        self.assertEqual(expected, factors(num))
+
+        # large even numbers stay integers
+        num, expected = 2 ** 80 * 3731292319, [2] * 80 + [3731292319]
+        self.assertEqual(expected, factors(num))
+
+        num, expected = 45845791 * 3731292319, [45845791, 3731292319]
+        self.assertEqual(expected, factors(num))
+
+        with self.assertRaises(ValueError):
+            factors(0)
+
+    def test_factorize(self):
+        self.assertEqual(factorize(1), {})
+        self.assertEqual(factorize(996), {2: 2, 3: 1, 83: 1})
+        self.assertEqual(factorize(3 ** 40 * 7 ** 3), {3: 40, 7: 3})
+        self.assertEqual(factorize(1009 ** 2 * 1013 ** 3), {1009: 2, 1013: 3})
+
+        p, q = 1000000000000037, 1000000001000053
+        self.assertEqual(factorize(p * q), {p: 1, q: 1})
+
+        # p - 1 = 2 * 43 * 1033 * 1049 * 1481 * 3697 * 4967
+        p, q = 2534386987284423179, 2305843009213693967
+        start = time.time()
+        self.assertEqual(factorize(p * q), {q: 1, p: 1})
+        end = time.time()
+        print("122-bit modulus with a smooth p-1, time taken: " + str(end - start))
+
+        for bits in [32, 40, 48]:
+            p, q = random_prime(bits // 2), random_prime(bits // 2 + 1)
+            self.assertEqual(factors(p * q), sorted([p, q]))
+
+    def test_trial_division(self):
+        self.assertEqual(trial_division(996), ({2: 2, 3: 1, 83: 1}, 1))
+        self.assertEqual(trial_division(7 * 3731292319), ({7: 1}, 3731292319))
+        self.assertEqual(trial_division(1009 * 1013), ({}, 1009 * 1013))
+
+    def test_fermat_factor(self):
+        self.assertEqual(fermat_factor(1000000000000037 * 1000000001000053), 1000000000000037)
+        self.assertEqual(fermat_factor(45845791 * 3731292319, 100), None)
+
+    def test_pollard_p_minus_1(self):
+        self.assertEqual(pollard_p_minus_1(2534386987284423179 * 2305843009213693967), 2534386987284423179)
+        self.assertEqual(pollard_p_minus_1(1009 * 1013, 2), None)
+
+    def test_pollard_rho_brent(self):
+        self.assertEqual(pollard_rho_brent(45845791 * 3731292319), 45845791)
+        self.assertEqual(pollard_rho_brent(2534386987284423179 * 2305843009213693967, max_iterations=1000), None)
+
     def test_is_primitive_root(self):
         g = 2
         p = 13
@@ -194,6 +621,132 @@ class Test(TestCase):
         g = 3
         self.assertFalse(is_primitive_root(g, p))
 
+        with self.assertRaises(ValueError):
+            is_primitive_root(1, p)
+        with self.assertRaises(ValueError):
+            is_primitive_root(2, 15)
+
+        # 2^127 - 1 is prime, the largest prime factor of p - 1 has 25 bits
+        p = 2 ** 127 - 1
+        self.assertTrue(is_primitive_root(43, p))
+        self.assertFalse(is_primitive_root(42, p))
+
+    def test_find_primitive_root(self):
+        self.assertEqual(find_primitive_root(2), 1)
+        self.assertEqual(find_primitive_root(13), 2)
+        self.assertEqual(find_primitive_root(41), 6)
+        self.assertEqual(find_primitive_root(3731292319), 6)
+        self.assertEqual(find_primitive_root(2 ** 127 - 1), 43)
+
+        for p in Test.primes_first_1000[1:]:
+            g = find_primitive_root(p)
+            self.assertEqual(len({pow(g, i, p) for i in range(1, p)}), p - 1)
+
+    def test_find_generator(self):
+        with self.assertRaises(ValueError):
+            find_generator(131, 11)
+        with self.assertRaises(ValueError):
+            find_generator(131, 26)
+
+        p, q = 131, 13
+        g = find_generator(p, q)
+        self.assertEqual(g, 107)
+        self.assertEqual(pow(g, q, p), 1)
+        self.assertEqual(len({pow(g, i, p) for i in range(q)}), q)
+
+    def test_fixed_base(self):
+        with self.assertRaises(ValueError):
+            FixedBase(2, 1)
+        with self.assertRaises(ValueError):
+            FixedBase(2, 101, v=0)
+        with self.assertRaises(ValueError):
+            FixedBase(2, 101, memory=10)
+
+        for bits in [8, 61, 256, 1024]:
+            p = random_prime(bits)
+            for base in [0, 1, 2, p - 1, p + 3]:
+                for v in [1, 2, 3]:
+                    for memory in [1 << 10, 1 << 20]:
+                        table = FixedBase(base, p, memory=memory, v=v)
+                        self.assertLessEqual(v * (1 << table.h) * sys.getsizeof(p), memory)
+                        for e in [0, 1, 2, p - 1, p, random.randrange(p)]:
+                            self.assertEqual(table.pow(e), pow(base, e, p))
+
+        # Exponents the table does not cover fall back to pow()
+        p = random_prime(128)
+        table = FixedBase(3, p, bits=64)
+        for e in [-5, 1 << 64, p, (1 << 64) - 1]:
+            self.assertEqual(table.pow(e), pow(3, e, p))
+
+        # stress test
+        p = random_prime(2048)
+        exponents = [random.randrange(p) for _ in range(20)]
+        start = time.time()
+        table = FixedBase(5, p)
+        mid = time.time()
+        self.assertEqual([table.pow(e) for e in exponents], [pow(5, e, p) for e in exponents])
+        end = time.time()
+        print("2048-bit fixed base table: " + str(mid - start) + ", 20 exponentiations (+ 20 pow()): " + str(end - mid))
+
+    def test_fixed_base_pow(self):
+        self.assertEqual(fixed_base_pow(3, 100, 101), pow(3, 100, 101))
+
+        p = random_prime(FIXED_BASE_MIN_BITS)
+        base = random.randrange(2, p)
+        for i in range(FIXED_BASE_USES + 3):
+            e = random.randrange(p)
+            self.assertEqual(fixed_base_pow(base, e, p), pow(base, e, p))
+            self.assertEqual((base, p, None) in math_module._fixed_base_tables, i + 1 >= FIXED_BASE_USES)
+
+        # Only the most recently built tables are kept
+        for _ in range(FIXED_BASE_CACHE + 1):
+            base = random.randrange(2, p)
+            for _ in range(FIXED_BASE_USES):
+                fixed_base_pow(base, 12345, p, 64)
+        self.assertEqual(len(math_module._fixed_base_tables), FIXED_BASE_CACHE)
+        self.assertEqual(fixed_base_pow(base, p - 2, p, 64), pow(base, p - 2, p))
+
+    def test_mod_sqrt(self):
+        # 998244353 = 119 * 2^23 + 1 needs the most Tonelli-Shanks rounds
+        for p in [3, 5, 7, 13, 17, 41, 1021, 998244353, 2 ** 127 - 1]:
+            for a in list(range(20)) + [random.randrange(p) for _ in range(20)]:
+                if a % p and jacobi_symbol(a, p) != 1:
+                    with self.assertRaises(ValueError):
+                        mod_sqrt(a, p)
+                else:
+                    self.assertEqual(pow(mod_sqrt(a, p), 2, p), a % p)
+
+    def test_baby_step_table(self):
+        with self.assertRaises(ValueError):
+            BabyStepTable(3, 101, 0)
+        with self.assertRaises(ValueError):
+            BabyStepTable(101, 101, 10)
+
+        # 2 is a primitive root mod 101, every logarithm < 100 is unique
+        for bound in [1, 2, 10, 99, 100]:
+            table = BabyStepTable(2, 101, bound)
+            for x in range(bound):
+                self.assertEqual(table.log(pow(2, x, 101)), x)
+            for x in range(bound, 100):
+                with self.assertRaises(ValueError):
+                    table.log(pow(2, x, 101))
+
+        p = random_prime(256)
+        with tempfile.TemporaryDirectory() as directory:
+            table = BabyStepTable(5, p, 1 << 16, directory)
+            self.assertTrue(os.path.exists(table.path))
+            loaded = BabyStepTable(5, p, 1 << 16, directory)
+            self.assertEqual(loaded.path, table.path)
+            self.assertIsInstance(loaded.keys, np.memmap)
+            self.assertTrue(all(loaded.keys[:-1] <= loaded.keys[1:]))
+            for x in [0, 1, 255, 256, 65535, random.randrange(1 << 16)]:
+                self.assertEqual(loaded.log(pow(5, x, p)), x)
+
+            # Other parameters get their own file, a damaged file is rebuilt
+            self.assertNotEqual(BabyStepTable(5, p, 1 << 10, directory).path, table.path)
+            np.save(table.path, np.zeros(4, dtype=np.uint64))
+            self.assertEqual(BabyStepTable(5, p, 1 << 16, directory).log(pow(5, 1234, p)), 1234)
+
     # Testing data
     large_primes = [174440041, 3731292319, 3657500101, 88362852307, 414507281407, 2428095424619, 4952019383323,
                     12055296811267, 17461204521323, 28871271685163, 53982894593057,
@@ -204,6 +757,11 @@ class Test(TestCase):
     large_composites = [
         6864797660130609714981900799081393217269435300143305409394463459185543183397656052122559640661454554977296311391480858037121987999716643812574028291115057157]
 
+    strong_pseudoprimes = [2047, 1373653, 25326001, 3215031751, 2152302898747, 3474749660383, 341550071728321,
+                           3825123056546413051, 318665857834031151167461, 3317044064679887385961981]
+
+    strong_lucas_pseudoprimes = [5459, 5777, 10877, 16109, 18971, 22499, 24569, 25199, 40309, 58519, 75077, 97439]
+
     primes_first_1000 = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97,
                          101, 103, 107, 109, 113, 127, 131, 137, 139, 149, 151, 157, 163, 167, 173, 179, 181, 191, 193,
                          197, 199, 211, 223, 227, 229, 233, 239, 241, 251, 257, 263, 269, 271, 277, 281, 283, 293, 307,
@@ -0,0 +1,410 @@
+import secrets
+from abc import ABC, abstractmethod
+
+from util.math import batch_mod_inverse, fixed_base_pow, is_prime, jacobi_symbol, mod_inverse, mod_sqrt
+
+
+class Group(ABC):
+    """
+    Cyclic group used by the group versions of ElGamal, Deffi-Hellman and DSA (..._group() methods)
+    - The group is written multiplicatively: multiply() is the group operation and exp() its repetition, which for
+      an elliptic curve are point addition and scalar multiplication.
+    - Elements are plain values (int for ModPGroup, (x, y) tuple or None for EllipticCurveGroup), encode() and
+      decode() convert them to and from bytes.
+    """
+
+    @property
+    @abstractmethod
+    def generator(self):
+        pass
+
+    @property
+    @abstractmethod
+    def order(self) -> int:
+        """
+        Order of the generator
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def identity(self):
+        pass
+
+    @abstractmethod
+    def multiply(self, a, b):
+        pass
+
+    @abstractmethod
+    def exp(self, a, k: int):
+        pass
+
+    @abstractmethod
+    def inverse(self, a):
+        pass
+
+    @abstractmethod
+    def encode(self, a) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes):
+        pass
+
+    @abstractmethod
+    def embed(self, m: int):
+        """
+        Message integer m -> group element, for ElGamal
+        """
+        pass
+
+    @abstractmethod
+    def extract(self, a) -> int:
+        """
+        Inverse of embed()
+        """
+        pass
+
+    @abstractmethod
+    def to_int(self, a) -> int:
+        """
+        Integer that DSA reduces mod the order to get r
+        """
+        pass
+
+    def random_exponent(self) -> int:
+        """
+        Secret exponent in [2, order) from the OS CSPRNG
+        """
+        return 2 + secrets.randbelow(self.order - 2)
+
+
+class ModPGroup(Group):
+    """
+    - Multiplicative group mod a prime p, generated by g
+    - Same arithmetic as the int versions of ElGamal, Deffi-Hellman and DSA, including fixed_base_pow()
+    """
+
+    def __init__(self, p: int, g: int, q: int = None):
+        """
+        :param p: prime
+        :param g: generator
+        :param q: [prime order of g (DSA), defaults to p - 1 for a primitive root g]
+        """
+        if not is_prime(p):
+            raise ValueError("p must be prime.")
+        if not 1 < g < p:
+            raise ValueError("g must be in [2, p - 1].")
+        if q is not None and not (is_prime(q) and (p - 1) % q == 0 and pow(g, q, p) == 1):
+            raise ValueError("q must be a prime divisor of p - 1 and the order of g.")
+
+        self.p = p
+        self.g = g
+        self.q = q or p - 1
+        self._size = (p.bit_length() + 7) // 8
+
+    def __repr__(self):
+        return 'ModPGroup(p=' + str(self.p) + ', g=' + str(self.g) + ', q=' + str(self.q) + ')'
+
+    @property
+    def generator(self) -> int:
+        return self.g
+
+    @property
+    def order(self) -> int:
+        return self.q
+
+    @property
+    def identity(self) -> int:
+        return 1
+
+    def multiply(self, a: int, b: int) -> int:
+        return a * b % self.p
+
+    def exp(self, a: int, k: int) -> int:
+        return fixed_base_pow(a, k, self.p, self.q.bit_length())
+
+    def inverse(self, a: int) -> int:
+        return mod_inverse(a, self.p)
+
+    def encode(self, a: int) -> bytes:
+        return a.to_bytes(self._size, byteorder='big')
+
+    def decode(self, data: bytes) -> int:
+        a = int.from_bytes(data, byteorder='big')
+        if len(data) != self._size or not 0 < a < self.p:
+            raise ValueError("Not an element of the group.")
+        return a
+
+    def embed(self, m: int) -> int:
+        if not 0 <= m < self.p:
+            raise ValueError("m must be in [0, p).")
+        return m
+
+    def extract(self, a: int) -> int:
+        return a
+
+    def to_int(self, a: int) -> int:
+        return a
+
+
+# Scalar multiplications by the generator add up precomputed multiples j * 2^(w * i) * G, w = this window
+EC_FIXED_BASE_WINDOW = 4
+# Width of the wNAF digits of other scalar multiplications, 2^(w - 2) odd multiples are precomputed per point
+EC_WNAF_WIDTH = 5
+# embed() tries the x coordinates m * EC_EMBED_FACTOR + j, j < EC_EMBED_FACTOR, each is on the curve with p ~ 1/2
+EC_EMBED_FACTOR = 256
+
+
+def wnaf(k: int, w: int) -> list:
+    """
+    Width-w non-adjacent form of k >= 0
+    - Digits are 0 or odd with |d| < 2^(w-1), and any w consecutive digits hold at most one non-zero digit
+
+    :return: digits, least significant first
+    """
+    digits = []
+    while k:
+        if k & 1:
+            d = k & ((1 << w) - 1)
+            if d >= 1 << (w - 1):
+                d -= 1 << w
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+class EllipticCurveGroup(Group):
+    """
+    Points of a short Weierstrass curve y^2 = x^3 + a*x + b over GF(p), generated by G
+    - Elements are affine points (x, y), None is the point at infinity (identity)
+    - Internally points are in Jacobian coordinates (X, Y, Z) ~ (X / Z^2, Y / Z^3), so additions and doublings
+      need no inversions. Results are converted back with a single inversion, precomputed points all share one
+      (see batch_mod_inverse()).
+    - exp() of the generator uses a fixed-base table of j * 2^(w * i) * G that is built on first use: one mixed
+      addition per w bits of the scalar and no doublings. Other points use wNAF, about bits / (w + 1) additions.
+    - encode() is the compressed SEC 1 form, 0x02 / 0x03 followed by x
+    """
+
+    def __init__(self, p: int, a: int, b: int, generator: (int, int), order: int,
+                 window: int = EC_FIXED_BASE_WINDOW, width: int = EC_WNAF_WIDTH):
+        """
+        :param p: prime > 3
+        :param a: curve coefficient
+        :param b: curve coefficient
+        :param generator: (x, y) point on the curve
+        :param order: prime order of the generator
+        :param window: [bits per row of the fixed-base table]
+        :param width: [wNAF width, >= 2]
+        """
+        if p <= 3 or not is_prime(p):
+            raise ValueError("p must be a prime > 3.")
+        if (4 * a ** 3 + 27 * b ** 2) % p == 0:
+            raise ValueError("The curve is singular.")
+        if window < 1 or width < 2:
+            raise ValueError("window must be >= 1 and width >= 2.")
+
+        self.p = p
+        self.a = a % p
+        self.b = b % p
+        self.window = window
+        self.width = width
+        self._size = (p.bit_length() + 7) // 8
+        if generator is None or not self.is_on_curve(generator):
+            raise ValueError("The generator must be a point on the curve.")
+        self.g = tuple(generator)
+        self.n = order
+        self._table = None
+
+    def __repr__(self):
+        return 'EllipticCurveGroup(p=' + hex(self.p) + ', a=' + hex(self.a) + ', b=' + hex(self.b) + ')'
+
+    @property
+    def generator(self) -> (int, int):
+        return self.g
+
+    @property
+    def order(self) -> int:
+        return self.n
+
+    @property
+    def identity(self):
+        return None
+
+    def is_on_curve(self, point) -> bool:
+        if point is None:
+            return True
+        x, y = point
+        p = self.p
+        return 0 <= x < p and 0 <= y < p and (y * y - x * x * x - self.a * x - self.b) % p == 0
+
+    def _double(self, X: int, Y: int, Z: int) -> (int, int, int):
+        p = self.p
+        if Z == 0 or Y == 0:
+            return 1, 1, 0
+        YY = Y * Y % p
+        S = 4 * X * YY % p
+        ZZ = Z * Z % p
+        M = (3 * X * X + self.a * ZZ * ZZ) % p
+        X3 = (M * M - 2 * S) % p
+        return X3, (M * (S - X3) - 8 * YY * YY) % p, 2 * Y * Z % p
+
+    def _add(self, X1: int, Y1: int, Z1: int, x2: int, y2: int) -> (int, int, int):
+        """
+        Jacobian point + affine point (mixed addition)
+        """
+        p = self.p
+        if Z1 == 0:
+            return x2, y2, 1
+        Z1Z1 = Z1 * Z1 % p
+        H = (x2 * Z1Z1 - X1) % p
+        r = (y2 * Z1 * Z1Z1 - Y1) % p
+        if H == 0:
+            # Same x: the points are equal or each other's inverse
+            return self._double(X1, Y1, Z1) if r == 0 else (1, 1, 0)
+        HH = H * H % p
+        HHH = H * HH % p
+        V = X1 * HH % p
+        X3 = (r * r - HHH - 2 * V) % p
+        return X3, (r * (V - X3) - Y1 * HHH) % p, Z1 * H % p
+
+    def _to_affine(self, points: list) -> list:
+        p = self.p
+        z_invs = iter(batch_mod_inverse([Z for _, _, Z in points if Z], p))
+        affine = []
+        for X, Y, Z in points:
+            if Z == 0:
+                affine.append(None)
+            else:
+                z_inv = next(z_invs)
+                zz_inv = z_inv * z_inv % p
+                affine.append((X * zz_inv % p, Y * zz_inv * z_inv % p))
+        return affine
+
+    def multiply(self, a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return self._to_affine([self._add(a[0], a[1], 1, *b)])[0]
+
+    def exp(self, a, k: int):
+        k %= self.n
+        if a is None or k == 0:
+            return None
+        if a == self.g:
+            return self._fixed_base_exp(k)
+
+        # Odd multiples a, 3a, 5a, ... of the wNAF digits
+        two_a = self._to_affine([self._double(a[0], a[1], 1)])[0]
+        if two_a is None:
+            return a if k & 1 else None
+        multiples = [(a[0], a[1], 1)]
+        for _ in range((1 << (self.width - 2)) - 1):
+            multiples.append(self._add(*multiples[-1], *two_a))
+        multiples = self._to_affine(multiples)
+
+        p = self.p
+        R = (1, 1, 0)
+        for d in reversed(wnaf(k, self.width)):
+            R = self._double(*R)
+            if d:
+                point = multiples[abs(d) >> 1]
+                if point is not None:
+                    R = self._add(*R, point[0], point[1] if d > 0 else -point[1] % p)
+        return self._to_affine([R])[0]
+
+    def _fixed_base_exp(self, k: int):
+        if self._table is None:
+            self._table = self._fixed_base_table()
+
+        w = self.window
+        mask = (1 << w) - 1
+        R = (1, 1, 0)
+        for row in self._table:
+            j = k & mask
+            if j and row[j - 1] is not None:
+                R = self._add(*R, *row[j - 1])
+            k >>= w
+        return self._to_affine([R])[0]
+
+    def _fixed_base_table(self) -> list:
+        """
+        Row i holds j * B_i for j = 1 .. 2^w - 1, where B_i = 2^(w * i) * G
+        """
+        w = self.window
+        points = []
+        base = self.g
+        for _ in range(-(-self.n.bit_length() // w)):
+            row = [(base[0], base[1], 1)]
+            for _ in range((1 << w) - 2):
+                row.append(self._add(*row[-1], *base))
+            points += row
+            base = self._to_affine([self._add(*row[-1], *base)])[0]
+            if base is None:
+                # The rest of the table would only hold the point at infinity
+                break
+
+        points = self._to_affine(points)
+        size = (1 << w) - 1
+        return [points[i:i + size] for i in range(0, len(points), size)]
+
+    def inverse(self, a):
+        return None if a is None else (a[0], -a[1] % self.p)
+
+    def encode(self, a) -> bytes:
+        if a is None:
+            return b'\x00'
+        return bytes([2 + (a[1] & 1)]) + a[0].to_bytes(self._size, byteorder='big')
+
+    def decode(self, data: bytes):
+        if data == b'\x00':
+            return None
+        if len(data) != self._size + 1 or data[0] not in (2, 3):
+            raise ValueError("Not a compressed point.")
+        x = int.from_bytes(data[1:], byteorder='big')
+        y = self._y(x)
+        if x >= self.p or y is None:
+            raise ValueError("Not a point on the curve.")
+        return x, y if y & 1 == data[0] & 1 else self.p - y
+
+    def _y(self, x: int):
+        """
+        One of the y s.t. (x, y) is on the curve, None if there is none
+        """
+        p = self.p
+        rhs = (x * x * x + self.a * x + self.b) % p
+        if rhs != 0 and jacobi_symbol(rhs, p) != 1:
+            return None
+        return mod_sqrt(rhs, p)
+
+    def embed(self, m: int):
+        """
+        Koblitz' method: the first x = m * EC_EMBED_FACTOR + j that is on the curve
+        """
+        if m < 0:
+            raise ValueError("m must be >= 0.")
+        for x in range(m * EC_EMBED_FACTOR, min((m + 1) * EC_EMBED_FACTOR, self.p)):
+            y = self._y(x)
+            if y is not None:
+                return x, y
+        raise ValueError("m can't be embedded, it must be less than p / " + str(EC_EMBED_FACTOR) + ".")
+
+    def extract(self, a) -> int:
+        return a[0] // EC_EMBED_FACTOR
+
+    def to_int(self, a) -> int:
+        return 0 if a is None else a[0]
+
+
+# NIST P-256 (FIPS 186-4, D.1.2.3)
+P256 = EllipticCurveGroup(
+    p=0xffffffff00000001000000000000000000000000ffffffffffffffffffffffff,
+    a=-3,
+    b=0x5ac635d8aa3a93e7b3ebbd55769886bc651d06b0cc53b0f63bce3c3e27d2604b,
+    generator=(0x6b17d1f2e12c4247f8bce6e563a440f277037d812deb33a0f4a13945d898c296,
+               0x4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececbb6406837bf51f5),
+    order=0xffffffff00000000ffffffffffffffffbce6faada7179e84f3b9cac2fc632551)
@@ -1,5 +1,17 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
 import random
-from sympy.ntheory.primetest import isprime
+import secrets
+import sys
+import threading
+from functools import lru_cache
+import numpy as np
+
+# Candidates are checked against the primes up to this bound before any modular exponentiation
+SMALL_PRIME_BOUND = 1000
 
 
 def gcd(a: int, b: int) -> int:
@@ -100,10 +112,191 @@ def mod_inverse(a: int, m: int) -> int:
         return x % m
 
 
+def batch_mod_inverse(values, m: int) -> list:
+    """
+    a^(-1) mod m for every a in values - Montgomery's trick
+    - Only the product of all values is inverted, every inverse is then recovered from the prefix products.
+      N inversions are replaced by 1 inversion and 3(N-1) multiplications.
+
+    :param values: iterable of integers s.t. 0 <= a < m
+    :return: list of modular inverses in input order
+    """
+    values = list(values)
+    if m <= 0:
+        raise ValueError('m must be > 0')
+
+    prefix = []
+    acc = 1
+    for i, a in enumerate(values):
+        if not 0 <= a < m:
+            raise ValueError('values[' + str(i) + '] = ' + str(a) + ' is not in the range 0 <= a < m')
+        acc = acc * a % m
+        prefix.append(acc)
+    if not values:
+        return []
+
+    if gcd(acc, m) != 1:
+        i = next(i for i, a in enumerate(values) if gcd(a, m) != 1)
+        raise ValueError('Modular inverse does not exist for values[' + str(i) + '] = ' + str(values[i]))
+
+    inverses = [0] * len(values)
+    inv = mod_inverse(acc, m)
+    for i in range(len(values) - 1, 0, -1):
+        inverses[i] = inv * prefix[i - 1] % m  # (a_0 ... a_i)^(-1) * (a_0 ... a_(i-1))
+        inv = inv * values[i] % m
+    inverses[0] = inv
+    return inverses
+
+
 def is_coprime(a: int, m: int) -> bool:
     return gcd(a, m) == 1
 
 
+# Array inputs with absolute values below this bound are processed with vectorized int64 arithmetic,
+# anything larger falls back to the scalar functions on Python integers.
+WORD_ARRAY_BOUND = 1 << 62
+
+
+def _word_arrays(*arrays) -> (list, bool):
+    """
+    Broadcasts the inputs against each other
+    - Returns int64 arrays if every value fits in WORD_ARRAY_BOUND, otherwise object arrays of Python integers
+    """
+    arrays = np.broadcast_arrays(*[np.asarray(x) for x in arrays])
+    if all(x.dtype.kind in 'iu' for x in arrays):
+        if all(x.size == 0 or (int(x.max()) < WORD_ARRAY_BOUND and int(x.min()) > -WORD_ARRAY_BOUND) for x in arrays):
+            return [x.astype(np.int64) for x in arrays], True
+    return [x.astype(object) for x in arrays], False
+
+
+def gcd_array(a, b) -> np.ndarray:
+    """
+    Element-wise gcd() over NumPy arrays (or anything broadcastable)
+    - Fixed width integers go through NumPy's gcd ufunc, a compiled Euclidean loop over the whole array
+    - Big integers fall back to gcd() per element
+    """
+    (a, b), words = _word_arrays(a, b)
+    if words:
+        if ((a == 0) & (b == 0)).any():
+            raise ValueError("gcd is undefined when a=0 and b=0.")
+        return np.gcd(a, b)
+    return np.frompyfunc(gcd, 2, 1)(a, b)
+
+
+def extended_gcd_array(a, b) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    Element-wise extended_gcd() over NumPy arrays (or anything broadcastable)
+    - The iterative Extended Euclidean Algorithm runs on whole int64 arrays at once,
+      each step only updates the elements that have not finished yet
+    - Big integers fall back to extended_gcd() per element
+
+    :return: gcd, x, y arrays s.t. ax + by = gcd(a,b)
+    """
+    (a, b), words = _word_arrays(a, b)
+    if ((a == 0) & (b == 0)).any():
+        raise ValueError("gcd is undefined when a=0 and b=0.")
+    if not words:
+        g, x, y = np.frompyfunc(extended_gcd, 2, 3)(a, b)
+        return g, x, y
+
+    a, b = a.copy(), b.copy()
+    x, y = np.zeros_like(a), np.ones_like(a)
+    u, v = np.ones_like(a), np.zeros_like(a)
+    active = a != 0
+    while active.any():
+        a_, b_ = a[active], b[active]
+        q, r = b_ // a_, b_ % a_
+        u_, v_ = u[active], v[active]
+        m, n = x[active] - u_ * q, y[active] - v_ * q
+        b[active], a[active], x[active], y[active], u[active], v[active] = a_, r, u_, v_, m, n
+        active = a != 0
+    return b, x, y
+
+
+def mod_inverse_array(a, m) -> np.ndarray:
+    """
+    Element-wise mod_inverse() over NumPy arrays
+    - m can be a single modulus or an array of moduli
+
+    :return: modular inverses of a
+    """
+    (a, m), _ = _word_arrays(a, m)
+    if not ((0 <= a) & (a < m) & (m > 0)).all():
+        raise ValueError('m and n must be such that 0 <= a < m and m > 1')
+
+    g, x, _ = extended_gcd_array(a, m)
+    invalid = np.flatnonzero(g != 1)
+    if invalid.size:
+        i = tuple(int(k) for k in np.unravel_index(invalid[0], a.shape))
+        raise ValueError('Modular inverse does not exist for a' + str(list(i)) + ' = ' + str(a[i]))
+    return x % m
+
+
+def is_coprime_array(a, m) -> np.ndarray:
+    """
+    Element-wise is_coprime() over NumPy arrays
+    """
+    return gcd_array(a, m) == 1
+
+
+def sieve_of_eratosthenes(limit: int) -> list:
+    """
+    Sieve of Eratosthenes
+    - Returns all primes p such that p <= limit
+
+    :return: list of primes in ascending order
+    """
+    if limit < 2:
+        return []
+
+    composite = bytearray(limit + 1)
+    for i in range(2, math.isqrt(limit) + 1):
+        if not composite[i]:
+            composite[i * i::i] = b'\x01' * ((limit - i * i) // i + 1)
+    return [i for i in range(2, limit + 1) if not composite[i]]
+
+
+@lru_cache(maxsize=None)
+def small_primes(bound: int = SMALL_PRIME_BOUND) -> tuple:
+    """
+    - Table of primes p <= bound
+    - Built once per bound and cached
+    """
+    return tuple(sieve_of_eratosthenes(bound))
+
+
+@lru_cache(maxsize=None)
+def _small_prime_set(bound: int) -> frozenset:
+    return frozenset(small_primes(bound))
+
+
+@lru_cache(maxsize=None)
+def primorial(bound: int = SMALL_PRIME_BOUND) -> int:
+    """
+    - Product of all primes p <= bound
+    - Built once per bound and cached
+    """
+    product = 1
+    for p in small_primes(bound):
+        product *= p
+    return product
+
+
+def has_small_factor(n: int, bound: int = SMALL_PRIME_BOUND) -> bool:
+    """
+    Small prime prefilter
+    - True if n has a prime factor p <= bound such that p < n
+    - A single gcd with the primorial of the bound replaces trial division by each small prime
+    - Intended to reject most composites before running the expensive tests
+
+    :param n: integer > 1
+    :param bound: largest small prime to be considered
+    """
+    if n <= bound:
+        return n not in _small_prime_set(bound)
+    return math.gcd(n, primorial(bound)) != 1
+
+
 def q1_isprime(n: int) -> bool:
     """
     Trial and error method
@@ -121,18 +314,29 @@ def q1_isprime(n: int) -> bool:
     return True
 
 
-def q2_isprime(n: int) -> bool:
+def q2_isprime(n: int, bound: int = SMALL_PRIME_BOUND) -> bool:
     """
     Square root method
     Only odd numbers are taken into account
+    - Primes up to 'bound' are ruled out in one step by the small prime prefilter,
+      the loop then continues from the first odd number above the bound.
     """
+    if n < 2:
+        return False
+
+    if n <= bound:
+        return n in _small_prime_set(bound)
+
+    if has_small_factor(n, bound):
+        return False
+
     if n == 2 or n == 3:
         return True
 
-    if n < 2 or n % 2 == 0 or n % 3 == 0:
+    if n % 2 == 0 or n % 3 == 0:
         return False
 
-    i = 5
+    i = max(5, bound + 1 + bound % 2)
     while i * i <= n:
         if n % i == 0:
             return False
@@ -141,20 +345,31 @@ def q2_isprime(n: int) -> bool:
     return True
 
 
-def miller_rabin_test(n: int, k=10) -> bool:
+def miller_rabin_test(n: int, k=10, bound: int = SMALL_PRIME_BOUND) -> bool:
     """
     Miller Rabin test for prime numbers - probabilistic approach
+    - Candidates with a prime factor <= bound are rejected by the small prime prefilter before any pow() call
 
     Reference
     - https://en.wikipedia.org/wiki/Miller%E2%80%93Rabin_primality_test#Miller%E2%80%93Rabin_test
 
     :param n:
     :param k: Number of time to run the main algorithm. A higher k value means greater accuracy and cost.
+    :param bound: Small prime prefilter bound. Set to 0 to disable the prefilter.
     """
+    if n < 2:
+        return False
+
+    if n <= bound:
+        return n in _small_prime_set(bound)
+
+    if has_small_factor(n, bound):
+        return False
+
     if n == 2 or n == 3:
         return True
 
-    if n < 2 or n % 2 == 0 or n % 3 == 0:
+    if n % 2 == 0 or n % 3 == 0:
         return False
 
     s = 0
@@ -179,42 +394,1119 @@ def miller_rabin_test(n: int, k=10) -> bool:
     return True
 
 
-def factors(n: int) -> list:
+# Using the first 12 primes as witnesses, the strong probable prime test is deterministic for all n below this
+# limit, which covers every 64-bit integer.
+DETERMINISTIC_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+DETERMINISTIC_LIMIT = 318665857834031151167461
+
+
+def strong_probable_prime_test(n: int, a: int) -> bool:
     """
-    Based on the square root method
-    Only odd numbers are taken into account
+    Strong probable prime test (a single round of Miller Rabin) for a fixed base 'a'
+    - n must be odd and n > 2
+    - A composite n that passes is called a strong pseudoprime to base a
+
+    :param n: odd integer > 2
+    :param a: base s.t. 1 < a < n - 1
     """
-    ls_factors = []
+    d = n - 1
+    s = (d & -d).bit_length() - 1  # number of trailing zero bits
+    d >>= s
 
-    while n % 2 == 0:
-        ls_factors.append(2)
-        n = n / 2
+    x = pow(a, d, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
 
-    i = 3
-    while i * i < n:
-        while n % i == 0:
-            ls_factors.append(i)
-            n = n // i
-        i += 2
 
-    if n > 1:
-        ls_factors.append(n)
+def jacobi_symbol(a: int, n: int) -> int:
+    """
+    Jacobi symbol (a/n) for odd n > 0
+
+    :return: -1, 0 or 1
+    """
+    if n <= 0 or n % 2 == 0:
+        raise ValueError("n must be a positive odd integer.")
+
+    a %= n
+    result = 1
+    while a != 0:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def mod_sqrt(a: int, p: int) -> int:
+    """
+    Square root of a mod an odd prime p - Tonelli-Shanks
+    - p = 3 mod 4 takes a single exponentiation a^((p+1)/4)
+
+    :return: r s.t. r^2 = a mod p (the other root is p - r)
+    """
+    a %= p
+    if a == 0:
+        return 0
+    if jacobi_symbol(a, p) != 1:
+        raise ValueError(str(a) + " is not a quadratic residue mod p")
+    if p % 4 == 3:
+        return pow(a, (p + 1) // 4, p)
+
+    # p - 1 = q * 2^s with q odd, z is any non-residue
+    q, s = p - 1, 0
+    while q % 2 == 0:
+        q, s = q // 2, s + 1
+    z = 2
+    while jacobi_symbol(z, p) != -1:
+        z += 1
+
+    c, t, r = pow(z, q, p), pow(a, q, p), pow(a, (q + 1) // 2, p)
+    while t != 1:
+        # Least i s.t. t^(2^i) = 1
+        i, t2 = 0, t
+        while t2 != 1:
+            t2, i = t2 * t2 % p, i + 1
+        b = pow(c, 1 << (s - i - 1), p)
+        s, c, t, r = i, b * b % p, t * b * b % p, r * b % p
+    return r
+
+
+def strong_lucas_test(n: int) -> bool:
+    """
+    Strong Lucas probable prime test
+    - Parameters are chosen with Selfridge's method A: D is the first of 5, -7, 9, -11, ... with (D/n) = -1,
+      P = 1 and Q = (1 - D) / 4
+
+    Reference
+    - https://en.wikipedia.org/wiki/Lucas_pseudoprime#Strong_Lucas_pseudoprimes
+
+    :param n: odd integer > 2
+    """
+    if math.isqrt(n) ** 2 == n:
+        return False  # Selfridge's search for D never ends on perfect squares
+
+    D = 5
+    while True:
+        j = jacobi_symbol(D, n)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != n:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P, Q = 1, (1 - D) // 4
+
+    d = n + 1
+    s = (d & -d).bit_length() - 1
+    d >>= s
+
+    # U_k, V_k and Q^k for k = 1, then the binary expansion of d is walked with the doubling formulas
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        U, V = U * V % n, (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if bit == '1':
+            U, V = P * U + V, D * U + P * V
+            if U & 1:
+                U += n
+            if V & 1:
+                V += n
+            U, V = (U >> 1) % n, (V >> 1) % n
+            Qk = Qk * Q % n
+
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if V == 0:
+            return True
+    return False
+
+
+def is_prime(n: int) -> bool:
+    """
+    Primality test
+    - n <= SMALL_PRIME_BOUND: table lookup
+    - Candidates with a small prime factor are rejected by the prefilter
+    - n < DETERMINISTIC_LIMIT (all 64-bit integers): strong probable prime tests with a fixed witness set,
+      the answer is proven
+    - Otherwise: Baillie-PSW (a strong base-2 test followed by a strong Lucas test). No composite is known to pass.
+
+    Reference
+    - https://en.wikipedia.org/wiki/Baillie%E2%80%93PSW_primality_test
+    """
+    if n < 2:
+        return False
+
+    if n <= SMALL_PRIME_BOUND:
+        return n in _small_prime_set(SMALL_PRIME_BOUND)
+
+    if has_small_factor(n):
+        return False
+
+    return _strong_tests(n)
+
+
+def _strong_tests(n: int) -> bool:
+    """
+    is_prime() without the small prime checks. n must be odd and greater than 37.
+    """
+    if n < DETERMINISTIC_LIMIT:
+        for a in DETERMINISTIC_WITNESSES:
+            if not strong_probable_prime_test(n, a):
+                return False
+        return True
+
+    return strong_probable_prime_test(n, 2) and strong_lucas_test(n)
+
+
+def are_prime(numbers) -> list:
+    """
+    Batch version of is_prime()
+
+    :param numbers: iterable of integers
+    :return: list of booleans in input order
+    """
+    return [is_prime(n) for n in numbers]
+
+
+# Prime search: number of odd candidates sieved at a time and the largest prime used by the sieve.
+# Sieving is much cheaper than a strong test, so a larger bound than SMALL_PRIME_BOUND pays off here.
+SIEVE_WINDOW = 4096
+SIEVE_BOUND = 1 << 15
+
+
+def sieve_window(start: int, size: int = SIEVE_WINDOW, bound: int = SIEVE_BOUND) -> list:
+    """
+    Incremental sieve over the odd numbers start, start + 2, ..., start + 2 * (size - 1)
+    - Removes every candidate that has a prime factor p <= bound (except p itself)
+
+    :param start: odd integer > 0
+    :param size: number of odd candidates in the window
+    :param bound: largest prime used to sieve
+    :return: offsets i s.t. start + 2 * i survived the sieve
+    """
+    if start % 2 == 0 or start < 1:
+        raise ValueError("start must be a positive odd integer.")
+
+    survivors = bytearray(b'\x01') * size
+    for p in small_primes(bound)[1:]:
+        # start + 2i = 0 (mod p)  <=>  i = -start * 2^(-1) (mod p)
+        i = (-start * ((p + 1) // 2)) % p
+        if start + 2 * i == p:
+            i += p
+        if i < size:
+            survivors[i::p] = bytes((size - 1 - i) // p + 1)
+    return [i for i in range(size) if survivors[i]]
+
+
+def _search_prime(start: int, end: int = None) -> int:
+    """
+    Smallest prime p s.t. start <= p < end, or None
+    - Windows of odd candidates are sieved and the strong tests are run only on the survivors
+    """
+    if start <= 2:
+        return 2 if end is None or end > 2 else None
+    start |= 1
+    while end is None or start < end:
+        for i in sieve_window(start):
+            candidate = start + 2 * i
+            if end is not None and candidate >= end:
+                return None
+            if candidate <= SMALL_PRIME_BOUND:
+                if candidate in _small_prime_set(SMALL_PRIME_BOUND):
+                    return candidate
+            elif _strong_tests(candidate):
+                return candidate
+        start += 2 * SIEVE_WINDOW
+    return None
+
+
+def next_prime(n: int) -> int:
+    """
+    Smallest prime p s.t. p > n
+    """
+    return _search_prime(n + 1)
+
+
+def _random_prime(bits: int, e: int = None) -> int:
+    while True:
+        # Key material, so the starting point comes from the OS CSPRNG and not from the predictable Mersenne Twister
+        # The two most significant bits are set, hence the product of 2 such primes has exactly 2 * bits bits
+        start = secrets.randbits(bits) | (3 << (bits - 2)) | 1
+        p = _search_prime(start, 1 << bits)
+        if p is not None and (e is None or gcd(e, p - 1) == 1):
+            return p
+
+
+def random_prime(bits: int, workers: int = None) -> int:
+    """
+    Random prime with the given bit length
+    - A random odd starting point is chosen, then windows of candidates are sieved incrementally
+      and only the survivors go through the strong tests (see is_prime())
+    - The two most significant bits are always set
+
+    :param bits: bit length of the prime, bits >= 2
+    :param workers: if set, the search is spread across a pool of this many processes and the first prime found is
+                    returned
+    :return: prime p s.t. 2^(bits-1) <= p < 2^bits
+    """
+    if bits < 2:
+        raise ValueError("bits must be >= 2")
+
+    return _first_result(_random_prime, (bits,), workers)
+
+
+def random_primes(bits: int, count: int, workers: int = None, e: int = None) -> list:
+    """
+    Distinct random primes with the given bit length, see random_prime()
+    - With workers, the primes are searched for concurrently and collected as they are found
+
+    :param bits: bit length of the primes, bits >= 8 if count > 1
+    :param count: number of primes
+    :param workers: [size of the process pool]
+    :param e: [if set, only primes p with gcd(e, p - 1) = 1 are returned, e.g. an RSA public exponent]
+    :return: list of 'count' distinct primes
+    """
+    if bits < 2:
+        raise ValueError("bits must be >= 2")
+    if count > 1 and bits < 8:
+        raise ValueError("bits must be >= 8 for more than one prime")
+
+    primes = []
+    while len(primes) < count:
+        for p in _first_results(_random_prime, (bits, e), workers, count - len(primes)):
+            if p not in primes:
+                primes.append(p)
+    return primes
+
+
+def _first_result(fn, args: tuple, workers: int = None):
+    """
+    Races fn(*args) in 'workers' processes and returns the first result, see _first_results()
+    """
+    return _first_results(fn, args, workers)[0]
+
+
+def _first_results(fn, args: tuple, workers: int = None, count: int = 1) -> list:
+    """
+    Runs fn(*args) repeatedly in 'workers' processes and returns the first 'count' results
+    - fn must be a randomized search. Every process reseeds 'random', since forked processes would otherwise
+      share the parent's state and all search the same candidates ('secrets' needs no reseeding).
+    - The processes are terminated as soon as enough results have arrived
+    - Without workers fn(*args) is simply called 'count' times in this process
+    """
+    if not workers or workers < 2:
+        return [fn(*args) for _ in range(count)]
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_put_results, args=(results, fn, args), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        found = []
+        while len(found) < count:
+            ok, result = results.get()
+            if not ok:
+                raise result
+            found.append(result)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        results.close()
+
+    return found
+
+
+def _put_results(results, fn, args: tuple):
+    random.seed()
+    try:
+        while True:
+            results.put((True, fn(*args)))
+    except Exception as e:
+        results.put((False, e))
+
+
+# Budgets for the special purpose factoring methods tried before Pollard rho
+FERMAT_STEPS = 1 << 12
+POLLARD_PM1_BOUND = 1 << 14
+
+
+def trial_division(n: int, bound: int = SMALL_PRIME_BOUND) -> (dict, int):
+    """
+    Removes all prime factors p <= bound from n
+
+    :return: ({prime: multiplicity}, remaining cofactor)
+    """
+    found = {}
+    for p in small_primes(bound):
+        if p * p > n:
+            break
+        while n % p == 0:
+            found[p] = found.get(p, 0) + 1
+            n //= p
+    if 1 < n <= bound:
+        found[n] = found.get(n, 0) + 1
+        n = 1
+    return found, n
+
+
+def fermat_factor(n: int, max_steps: int = FERMAT_STEPS) -> int:
+    """
+    Fermat's factorization method
+    - Writes n = a^2 - b^2 = (a - b)(a + b) starting from a = ceil(sqrt(n))
+    - Succeeds within a few steps when n = p * q and p, q are close together
+
+    :param n: odd composite
+    :return: a non-trivial factor of n, or None if none was found within max_steps
+    """
+    if n % 2 == 0:
+        return 2
+
+    a = math.isqrt(n)
+    if a * a < n:
+        a += 1
+    b2 = a * a - n
+    for _ in range(max_steps):
+        b = math.isqrt(b2)
+        if b * b == b2:
+            return a - b if a - b > 1 else None
+        b2 += 2 * a + 1
+        a += 1
+    return None
 
+
+def pollard_p_minus_1(n: int, bound: int = POLLARD_PM1_BOUND) -> int:
+    """
+    Pollard's p - 1 method
+    - Finds a prime factor p of n when p - 1 is bound-smooth (every prime power dividing p - 1 is <= bound)
+
+    Reference
+    - https://en.wikipedia.org/wiki/Pollard%27s_p_%E2%88%92_1_algorithm
+
+    :return: a non-trivial factor of n, or None
+    """
+    a = 2
+    for p in small_primes(bound):
+        pk = p
+        while pk * p <= bound:
+            pk *= p
+        a = pow(a, pk, n)
+
+    g = math.gcd(a - 1, n)
+    return g if 1 < g < n else None
+
+
+def pollard_rho_brent(n: int, c: int = 1, batch: int = 128, max_iterations: int = None) -> int:
+    """
+    Pollard's rho method with Brent's cycle detection
+    - f(x) = x^2 + c (mod n)
+    - |x - y| values are multiplied together and a single gcd is taken per batch instead of one gcd per step
+
+    Reference
+    - R. P. Brent, An improved Monte Carlo factorization algorithm, 1980
+
+    :param n: odd composite
+    :param c: constant of the pseudo random function. Retry with another c when None is returned.
+    :param batch: number of steps per gcd
+    :param max_iterations: optional cap on the number of steps
+    :return: a non-trivial factor of n, or None
+    """
+    if n % 2 == 0:
+        return 2
+
+    y, r, q, g = 2, 1, 1, 1
+    x = ys = y
+    iterations = 0
+    while g == 1:
+        x = y
+        for _ in range(r):
+            y = (y * y + c) % n
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for _ in range(min(batch, r - k)):
+                y = (y * y + c) % n
+                q = q * abs(x - y) % n
+            g = math.gcd(q, n)
+            k += batch
+        iterations += 2 * r
+        r *= 2
+        if max_iterations is not None and iterations > max_iterations and g == 1:
+            return None
+
+    if g == n:
+        # The batch overshot, step through it one gcd at a time
+        while True:
+            ys = (ys * ys + c) % n
+            g = math.gcd(abs(x - ys), n)
+            if g > 1:
+                break
+
+    return g if g != n else None
+
+
+def _find_factor(n: int) -> int:
+    """
+    Non-trivial factor of a composite n without small prime factors
+    - Cheap special purpose methods first, then Pollard rho until it succeeds
+    """
+    d = fermat_factor(n)
+    if d is None:
+        d = pollard_p_minus_1(n)
+    c = 1
+    while d is None:
+        d = pollard_rho_brent(n, c)
+        c += 1
+    return d
+
+
+def factorize(n: int) -> dict:
+    """
+    Integer factorization
+    - Trial division for small factors
+    - Fermat's method for factors close to sqrt(n)
+    - Pollard p - 1 for factors p where p - 1 is smooth
+    - Pollard rho (Brent) for everything else
+    - Every cofactor is checked with is_prime() before further splitting
+
+    :param n: integer >= 1
+    :return: {prime: multiplicity} in ascending order of primes
+    """
+    if n < 1:
+        raise ValueError("n must be a positive integer.")
+
+    found, n = trial_division(n)
+    stack = [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if is_prime(m):
+            found[m] = found.get(m, 0) + 1
+            continue
+        d = _find_factor(m)
+        stack += [d, m // d]
+
+    return dict(sorted(found.items()))
+
+
+def factors(n: int) -> list:
+    """
+    Prime factors of n with multiplicity, in ascending order
+    - e.g. factors(996) = [2, 2, 3, 83]
+    - see factorize()
+    """
+    ls_factors = []
+    for p, e in factorize(n).items():
+        ls_factors += [p] * e
     return ls_factors
 
 
+@lru_cache(maxsize=256)
+def _order_prime_factors(p: int) -> tuple:
+    """
+    Distinct prime factors of p - 1, the order of the multiplicative group mod p
+    - p is validated and p - 1 is factorized only once per p
+    """
+    if not is_prime(p):
+        raise ValueError("p should be a prime number.")
+    return tuple(factorize(p - 1))
+
+
 def is_primitive_root(g: int, p: int) -> bool:
     """
-    - Basic algorithm for checking primitive roots
-    - Not efficient for large primes
+    - g is a primitive root mod p iff g^((p-1)/q) != 1 (mod p) for every prime factor q of p-1
+    - The factorization of p-1 is computed once and cached per p
     """
     if not (1 < g < p):
         raise ValueError("2 <= g <= p-1")
-    if not isprime(p):
-        raise ValueError("p should be a prime number.")
 
-    s = set()
-    for i in range(1, p):
-        s.add(pow(g, i, p))
+    for q in _order_prime_factors(p):
+        if pow(g, (p - 1) // q, p) == 1:
+            return False
+    return True
+
+
+def find_primitive_root(p: int) -> int:
+    """
+    Smallest primitive root mod p
+
+    :param p: prime number
+    """
+    if p == 2:
+        return 1
+
+    g = 2
+    while not is_primitive_root(g, p):
+        g += 1
+    return g
+
+
+def find_generator(p: int, q: int) -> int:
+    """
+    Generator of the subgroup of order q in the multiplicative group mod p
+    - g = h^((p-1)/q) (mod p) for the smallest h > 1 s.t. g != 1
+    - Only q has to be known, p - 1 does not need to be factorized. This is how the DSA generator is chosen.
+
+    :param p: prime number
+    :param q: prime s.t. (p - 1) % q == 0
+    """
+    if not (is_prime(p) and is_prime(q)):
+        raise ValueError("p & q must be prime.")
+    if (p - 1) % q != 0:
+        raise ValueError("(p-1) must be divisible by q")
+
+    h, g = 2, 1
+    while g == 1:
+        g = pow(h, (p - 1) // q, p)
+        h += 1
+    return g
+
+
+def safe_prime_sieve_window(start: int, size: int = SIEVE_WINDOW, bound: int = SIEVE_BOUND) -> list:
+    """
+    Combined sieve for safe primes over the odd numbers q = start, start + 2, ..., start + 2 * (size - 1)
+    - Removes every q s.t. q or 2q + 1 has a prime factor r <= bound (except r itself)
+
+    :param start: odd integer > 0
+    :return: offsets i s.t. q = start + 2 * i survived the sieve
+    """
+    if start % 2 == 0 or start < 1:
+        raise ValueError("start must be a positive odd integer.")
+
+    survivors = bytearray(b'\x01') * size
+    for r in small_primes(bound)[1:]:
+        half = (r + 1) // 2  # 2^(-1) mod r
+        # q = 0 (mod r) and 2q + 1 = 0 (mod r) <=> q = (r - 1) / 2 (mod r)
+        for residue, itself in ((0, r), ((r - 1) // 2, (r - 1) // 2)):
+            i = ((residue - start) * half) % r
+            if start + 2 * i == itself:
+                i += r
+            if i < size:
+                survivors[i::r] = bytes((size - 1 - i) // r + 1)
+    return [i for i in range(size) if survivors[i]]
+
+
+def _is_safe_prime_pair(q: int) -> bool:
+    """
+    True if q and p = 2q + 1 are both prime
+    - Cheap base-2 tests on q and p first. Once q is prime, 2^(p-1) = 1 (mod p) together with
+      gcd(2^2 - 1, p) = 1, i.e. 3 does not divide p, proves p is prime (Pocklington).
+    """
+    p = 2 * q + 1
+    if q <= SMALL_PRIME_BOUND:
+        return is_prime(q) and is_prime(p)
+    return p % 3 != 0 and strong_probable_prime_test(q, 2) and pow(2, p - 1, p) == 1 and _strong_tests(q)
+
+
+def _random_safe_prime(bits: int) -> (int, int):
+    while True:
+        start = random.getrandbits(bits - 1) | (1 << (bits - 2)) | 1
+        while start < 1 << (bits - 1):
+            for i in safe_prime_sieve_window(start):
+                q = start + 2 * i
+                if q >= 1 << (bits - 1):
+                    break
+                if _is_safe_prime_pair(q):
+                    return 2 * q + 1, q
+            start += 2 * SIEVE_WINDOW
+
+
+def random_safe_prime(bits: int, workers: int = None) -> (int, int):
+    """
+    Random safe prime p = 2q + 1 where q is also prime (q is called a Sophie Germain prime)
+    - Windows of q candidates are sieved for small factors of both q and 2q + 1 at once
+
+    :param bits: bit length of p, bits >= 4
+    :param workers: if set, the search is raced in a pool of this many processes
+    :return: (p, q)
+    """
+    if bits < 4:
+        raise ValueError("bits must be >= 4")
+    return _first_result(_random_safe_prime, (bits,), workers)
+
+
+def _random_schnorr_prime(L: int, N: int) -> (int, int):
+    while True:
+        q = random_prime(N)
+
+        # p = 2jq + 1 with L bits, j ranges over [j_min, j_max)
+        j_min = ((1 << (L - 1)) - 1) // (2 * q) + 1
+        j_max = ((1 << L) - 2) // (2 * q) + 1
+        if j_min >= j_max:
+            continue
+
+        # 2jq + 1 = 0 (mod r) <=> j = -(2q)^(-1) (mod r)
+        roots = [(r, -pow(2 * q, -1, r)) for r in small_primes(SIEVE_BOUND)[1:] if r != q]
+
+        start = random.randrange(j_min, j_max)
+        while start < j_max:
+            survivors = bytearray(b'\x01') * SIEVE_WINDOW
+            for r, root in roots:
+                i = (root - start) % r
+                if 2 * (start + i) * q + 1 == r:
+                    i += r  # p = r itself is prime
+                if i < SIEVE_WINDOW:
+                    survivors[i::r] = bytes((SIEVE_WINDOW - 1 - i) // r + 1)
+
+            for i in range(min(SIEVE_WINDOW, j_max - start)):
+                p = 2 * (start + i) * q + 1
+                if survivors[i] and pow(2, p - 1, p) == 1 and is_prime(p):
+                    return p, q
+            start += SIEVE_WINDOW
+
+
+def random_schnorr_group(L: int, N: int, workers: int = None) -> (int, int, int):
+    """
+    Schnorr group: primes p, q with q | p - 1 and a generator g of the subgroup of order q (as used by DSA)
+    - q is a random N-bit prime, then p = 2jq + 1 is searched over a sieved window of j values
+
+    :param L: bit length of p
+    :param N: bit length of q, N < L
+    :param workers: if set, the search is raced in a pool of this many processes
+    :return: (p, q, g)
+    """
+    if not 2 <= N < L:
+        raise ValueError("2 <= N < L")
+    if N == L - 1:
+        raise ValueError("L - 1 bit q only fits safe primes, use random_safe_prime()")
+
+    p, q = _first_result(_random_schnorr_prime, (L, N), workers)
+    return p, q, find_generator(p, q)
+
+
+def _cached_params(cache: str, key: str, generate) -> tuple:
+    """
+    Group parameters are expensive to generate. When 'cache' is the path of a JSON file, parameters are loaded from
+    it under 'key' if present, otherwise they are generated and stored there.
+    """
+    if cache is None:
+        return generate()
+
+    params = {}
+    if os.path.exists(cache):
+        with open(cache) as f:
+            params = json.load(f)
+    if key in params:
+        return tuple(params[key])
+
+    result = generate()
+    params[key] = list(result)
+    tmp = cache + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(params, f)
+    os.replace(tmp, cache)
+    return result
+
+
+def gen_safe_prime_group(bits: int, workers: int = None, cache: str = None) -> (int, int, int):
+    """
+    Group parameters for ElGamal and Diffie-Hellman
+    - p = 2q + 1 is a random safe prime and g is the smallest primitive root mod p
+
+    :param bits: bit length of p
+    :param workers: if set, the search is raced in a pool of this many processes
+    :param cache: optional path of a JSON file the parameters are loaded from/stored in
+    :return: (p, q, g)
+    """
+    def generate():
+        p, q = random_safe_prime(bits, workers)
+        return p, q, find_primitive_root(p)
+
+    return _cached_params(cache, 'safe-' + str(bits), generate)
+
+
+def gen_schnorr_group(L: int, N: int, workers: int = None, cache: str = None) -> (int, int, int):
+    """
+    Group parameters for DSA
+    - see random_schnorr_group()
+
+    :param L: bit length of p
+    :param N: bit length of q
+    :param workers: if set, the search is raced in a pool of this many processes
+    :param cache: optional path of a JSON file the parameters are loaded from/stored in
+    :return: (p, q, g)
+    """
+    return _cached_params(cache, 'schnorr-' + str(L) + '-' + str(N), lambda: random_schnorr_group(L, N, workers))
+
+
+# Moduli are processed in chunks of this size by batch_gcd(), which bounds the size of the product/remainder trees
+BATCH_GCD_CHUNK = 4096
+
+
+def product_tree(values: list) -> list:
+    """
+    Product tree
+    - Level 0 holds the values, every node of the next level is the product of 2 nodes of the level below
+    - The last level holds the product of all values
+
+    :return: list of levels
+    """
+    tree = [list(values)]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        tree.append([level[i] * level[i + 1] if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)])
+    return tree
+
+
+DIVISION_LIMIT = 4000  # bits, below this large_mod() leaves the division to %
+
+
+def large_mod(a: int, b: int) -> int:
+    """
+    a mod b for a >= 0 and b > 0 - Burnikel-Ziegler recursive division
+    - CPython divides with the schoolbook method, quadratic in the size of the numbers. Splitting the division into
+      halves turns it into multiplications, which CPython does with Karatsuba, so megabit remainders are many
+      times faster. Small operands go straight to %.
+    - a is divided as base 2^n digits, n = bits(b), one 2n by n bit division (_div2n1n()) per digit
+    """
+    n = b.bit_length()
+    if n <= DIVISION_LIMIT or a.bit_length() - n <= DIVISION_LIMIT:
+        return a % b
+
+    mask = (1 << n) - 1
+    r = 0
+    for i in reversed(range(-(-a.bit_length() // n))):
+        _, r = _div2n1n(r << n | (a >> (i * n)) & mask, b, n)
+    return r
+
+
+def _div2n1n(a: int, b: int, n: int) -> (int, int):
+    """
+    divmod(a, b) for a < b * 2^n and bits(b) = n: the upper and the lower half of the quotient each take a 3 by 2
+    half digit division
+    """
+    if a.bit_length() - n <= DIVISION_LIMIT:
+        return divmod(a, b)
+    pad = n & 1
+    if pad:
+        a, b, n = a << 1, b << 1, n + 1
+    half = n >> 1
+    mask = (1 << half) - 1
+    b1, b2 = b >> half, b & mask
+    q1, r = _div3n2n(a >> n, (a >> half) & mask, b, b1, b2, half)
+    q2, r = _div3n2n(r, a & mask, b, b1, b2, half)
+    if pad:
+        r >>= 1
+    return q1 << half | q2, r
+
+
+def _div3n2n(a12: int, a3: int, b: int, b1: int, b2: int, n: int) -> (int, int):
+    """
+    divmod(a12 * 2^n + a3, b) for b = b1 * 2^n + b2: the quotient is estimated from a12 / b1 and corrected by at
+    most 2
+    """
+    if a12 >> n == b1:
+        q, r = (1 << n) - 1, a12 - (b1 << n) + b1
+    else:
+        q, r = _div2n1n(a12, b1, n)
+    r = (r << n | a3) - q * b2
+    while r < 0:
+        q -= 1
+        r += b
+    return q, r
+
+
+def remainder_tree(value: int, tree: list, square: bool = False) -> list:
+    """
+    Remainder tree
+    - Reduces 'value' modulo the root of the product tree, then each node's remainder modulo its children,
+      which is much cheaper than reducing 'value' modulo each leaf separately
+    - The large remainders near the root use large_mod()
+
+    :param tree: product tree, see product_tree()
+    :param square: reduce modulo the squares of the nodes instead
+    :return: value mod leaf (or mod leaf^2) for each leaf
+    """
+    remainders = [value]
+    for level in reversed(tree):
+        remainders = [large_mod(remainders[i // 2], n * n if square else n) for i, n in enumerate(level)]
+    return remainders
+
+
+def batch_gcd(moduli, chunk_size: int = BATCH_GCD_CHUNK) -> list:
+    """
+    Bernstein's batch gcd
+    - For every n_i computes gcd(n_i, product of all the other moduli) using product and remainder trees
+      instead of comparing every pair: with N the product of all moduli, (N mod n_i^2) / n_i = (N / n_i) mod n_i
+    - The trees are split in two. The moduli are grouped into chunks of 'chunk_size', an upper product tree is
+      built over the chunk products and N is pushed down it modulo their squares, which gives N mod P_i^2 for every
+      chunk product P_i in O(k log k) multiplications for k chunks. Each chunk then gets its own lower tree, one
+      chunk at a time.
+    - Memory: all the moduli are kept (the input is read once, the lower trees need them again), plus the upper
+      tree, whose levels are each about as large as the input, and the tree of one chunk.
+    - The time goes into the multiplications and large_mod() divisions near the roots, O(M(S) log S) for S bits of
+      input with M the cost of a multiplication, Karatsuba in CPython. 'chunk_size' barely changes it.
+
+    Reference
+    - https://facthacks.cr.yp.to/batchgcd.html
+
+    :param moduli: iterable of positive integers
+    :param chunk_size: number of moduli per chunk
+    :return: list of gcds in input order. A gcd > 1 means the modulus shares a factor with another one.
+    """
+    moduli = list(moduli)
+    chunks = [moduli[i:i + chunk_size] for i in range(0, len(moduli), chunk_size)]
+    if not chunks:
+        return []
+
+    upper = product_tree([product_tree(chunk)[-1][0] for chunk in chunks])
+    chunk_remainders = remainder_tree(upper[-1][0], upper, square=True)
+
+    gcds = []
+    for chunk, z in zip(chunks, chunk_remainders):
+        for n, r in zip(chunk, remainder_tree(z, product_tree(chunk), square=True)):
+            gcds.append(math.gcd(r // n, n))
+    return gcds
+
+
+def find_shared_factors(moduli, chunk_size: int = BATCH_GCD_CHUNK) -> list:
+    """
+    Audits RSA moduli for shared primes with batch_gcd()
+
+    :param moduli: iterable of RSA moduli, kept in memory (batch_gcd() keeps them anyway)
+    :param chunk_size: see batch_gcd()
+    :return: list of (index, n, p, q) for every weak modulus. p and q are None if the modulus could not be split,
+             i.e. the same modulus occurs more than once.
+    """
+    moduli = list(moduli)
+    weak = [(i, g) for i, g in enumerate(batch_gcd(moduli, chunk_size)) if g != 1]
+
+    result = []
+    for i, g in weak:
+        n = moduli[i]
+        if g == n:
+            # Both primes are shared (with different moduli), split n against the other weak moduli
+            g = next((d for d in (math.gcd(n, moduli[j]) for j, _ in weak if j != i) if 1 < d < n), n)
+        if g == n:
+            result.append((i, n, None, None))
+        else:
+            p, q = sorted((g, n // g))
+            result.append((i, n, p, q))
+    return result
+
+
+# Fixed-base exponentiation
+FIXED_BASE_MEMORY = 1 << 20  # bytes per table
+FIXED_BASE_MIN_BITS = 256  # fixed_base_pow() uses pow() for smaller moduli
+FIXED_BASE_USES = 2  # fixed_base_pow() builds a table for a (base, mod) pair on its 2nd use
+FIXED_BASE_CACHE = 16  # tables kept by fixed_base_pow()
+
+
+class FixedBase:
+    """
+    Fixed-base exponentiation base^e mod m with a Lim-Lee comb table
+    - The bits of e are written as h rows of a = ceil(bits / h) bits. Each column of bits is an index into a table
+      of the 2^h products of base^(2^(j*a)), j = 0..h-1, so base^e takes a squarings and a multiplications
+      instead of the 'bits' squarings (plus window multiplications) of pow().
+    - With v blocks, the columns are split into v blocks of b = a / v columns, each with its own table (the
+      previous one raised to 2^b): b squarings and v * b multiplications, for v times the memory.
+    - h is the largest window s.t. the tables fit into 'memory' bytes and 2^h <= bits, the table is then about as
+      costly to build as a single pow()
+    - Exponents that are negative or longer than 'bits' fall back to pow()
+    """
+    __slots__ = ('base', 'mod', 'bits', 'h', 'v', 'a', 'b', 'tables')
+
+    def __init__(self, base: int, mod: int, bits: int = None, memory: int = FIXED_BASE_MEMORY, v: int = 1):
+        """
+        :param base: base
+        :param mod: modulus > 1
+        :param bits: [largest exponent bit length the table covers, defaults to the bit length of mod]
+        :param memory: [memory budget of the tables in bytes]
+        :param v: [number of blocks]
+        """
+        if mod < 2:
+            raise ValueError("mod must be > 1")
+        if v < 1:
+            raise ValueError("v must be >= 1")
+
+        self.base = base % mod
+        self.mod = mod
+        self.bits = bits = max(1, bits or mod.bit_length())
+        self.v = v
+
+        entries = memory // (v * sys.getsizeof(mod))
+        if entries < 2:
+            raise ValueError("memory is too small for a table")
+        h = 1
+        while 2 << h <= min(entries, bits):
+            h += 1
+        self.h = h
+
+        a = -(-bits // h)
+        self.b = b = -(-a // v)
+        self.a = a = b * v
+
+        # base^(2^(j*a)) for every row j
+        row_bases = []
+        x = self.base
+        for _ in range(h):
+            row_bases.append(x)
+            for _ in range(a):
+                x = x * x % mod
+
+        table = [1] * (1 << h)
+        for j in range(h):
+            for i in range(1 << j):
+                table[i | (1 << j)] = table[i] * row_bases[j] % mod
+        self.tables = [table]
+
+        for _ in range(1, v):
+            table = []
+            for x in self.tables[-1]:
+                for _ in range(b):
+                    x = x * x % mod
+                table.append(x)
+            self.tables.append(table)
+
+    def pow(self, exponent: int) -> int:
+        """
+        base^exponent mod m
+        """
+        if exponent < 0 or exponent.bit_length() > self.bits:
+            return pow(self.base, exponent, self.mod)
+
+        a, b, mod, tables = self.a, self.b, self.mod, self.tables
+
+        # Column k of the rows (k = a-1 first) as an integer, the bit of row j being bit j of the index
+        bits = format(exponent, '0' + str(self.h * a) + 'b')
+        rows = [bits[i:i + a] for i in range(0, len(bits), a)]
+        columns = [int(''.join(column), 2) for column in zip(*rows)]
+
+        r = 1
+        for k in range(b - 1, -1, -1):
+            r = r * r % mod
+            for s in range(self.v - 1, -1, -1):
+                r = r * tables[s][columns[a - 1 - s * b - k]] % mod
+        return r
+
+
+_fixed_base_uses = {}
+_fixed_base_tables = {}
+_fixed_base_lock = threading.Lock()
+
+
+def fixed_base_pow(base: int, exponent: int, mod: int, bits: int = None) -> int:
+    """
+    pow(base, exponent, mod) for long-lived bases such as group generators and public keys
+    - The uses of every (base, mod) pair are counted. From the FIXED_BASE_USES-th use on, a FixedBase table is built
+      for the pair and kept for later calls (the FIXED_BASE_CACHE most recently built tables are kept).
+    - Moduli below FIXED_BASE_MIN_BITS bits always use pow()
+
+    :param bits: [largest bit length of the exponents used with this base, defaults to the bit length of mod]
+    """
+    if mod.bit_length() < FIXED_BASE_MIN_BITS:
+        return pow(base, exponent, mod)
+
+    key = (base, mod, bits)
+    table = _fixed_base_tables.get(key)
+    if table is None:
+        with _fixed_base_lock:
+            uses = _fixed_base_uses.get(key, 0) + 1
+            if uses < FIXED_BASE_USES:
+                # Bases that are only ever used once (e.g. ephemeral keys) must not pile up
+                if len(_fixed_base_uses) >= 64 * FIXED_BASE_CACHE:
+                    _fixed_base_uses.clear()
+                _fixed_base_uses[key] = uses
+                return pow(base, exponent, mod)
+            _fixed_base_uses.pop(key, None)
+
+        table = FixedBase(base, mod, bits)
+        with _fixed_base_lock:
+            if len(_fixed_base_tables) >= FIXED_BASE_CACHE:
+                del _fixed_base_tables[next(iter(_fixed_base_tables))]
+            _fixed_base_tables[key] = table
+    return table.pow(exponent)
+
+
+BSGS_KEY_MASK = (1 << 64) - 1  # baby steps are stored by the low 64 bits of g^j
+
+
+class BabyStepTable:
+    """
+    Discrete logarithm x = log_g(y) mod p for 0 <= x < bound - baby-step giant-step with a precomputed table
+    - Baby steps: the m = ceil(sqrt(bound)) values g^j, j < m, sorted by their low 64 bits. Giant steps: y * g^(-m*i)
+      is looked up with a binary search until it hits a baby step g^j, then x = m*i + j.
+    - The table is a single uint64 array, the m sorted keys followed by their exponents j (16 bytes per baby step).
+      Two powers can share a key, so a hit is only accepted once g^j is checked in full.
+    - With a 'directory' the table is built once per (g, p, bound) and saved there as an .npy file. Later tables for
+      the same parameters memory-map it instead of building it again.
+    """
+    __slots__ = ('g', 'p', 'bound', 'm', 'keys', 'exponents', 'giant_step', 'path')
+
+    def __init__(self, g: int, p: int, bound: int, directory: str = None):
+        """
+        :param g: base
+        :param p: prime modulus
+        :param bound: logarithms in [0, bound) are found
+        :param directory: [directory the table file is stored in/loaded from]
+        """
+        if bound < 1:
+            raise ValueError("bound must be >= 1")
+        if not 1 < g < p:
+            raise ValueError("g must be in [2, p - 1]")
+
+        self.g, self.p, self.bound = g, p, bound
+        self.m = m = math.isqrt(bound - 1) + 1
+        self.giant_step = pow(g, -m, p)
+
+        self.path = None
+        table = None
+        if directory is not None:
+            name = hashlib.sha256((str(g) + ':' + str(p) + ':' + str(bound)).encode()).hexdigest()[:32]
+            self.path = os.path.join(directory, 'bsgs-' + name + '.npy')
+            if os.path.exists(self.path):
+                table = np.load(self.path, mmap_mode='r')
+                if table.shape != (2 * m,) or pow(g, int(table[m]), p) & BSGS_KEY_MASK != int(table[0]):
+                    table = None
+
+        if table is None:
+            table = self._build()
+            if self.path is not None:
+                tmp = self.path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    np.save(f, table)
+                os.replace(tmp, self.path)
+                table = np.load(self.path, mmap_mode='r')
+
+        self.keys, self.exponents = table[:m], table[m:]
+
+    def _build(self) -> np.ndarray:
+        g, p, m = self.g, self.p, self.m
+        keys = np.empty(m, dtype=np.uint64)
+        v = 1
+        for j in range(m):
+            keys[j] = v & BSGS_KEY_MASK
+            v = v * g % p
+
+        order = np.argsort(keys, kind='stable')
+        return np.concatenate((keys[order], order.astype(np.uint64)))
 
-    return len(s) == p - 1
+    def log(self, y: int) -> int:
+        """
+        :return: x s.t. g^x = y mod p and 0 <= x < bound
+        """
+        g, p, m, keys = self.g, self.p, self.m, self.keys
+        y %= p
+        for i in range(-(-self.bound // m)):
+            key = np.uint64(y & BSGS_KEY_MASK)
+            k = int(np.searchsorted(keys, key))
+            while k < m and keys[k] == key:
+                j = int(self.exponents[k])
+                x = m * i + j
+                if x < self.bound and pow(g, j, p) == y:
+                    return x
+                k += 1
+            y = y * self.giant_step % p
+        raise ValueError("The logarithm is not in [0, " + str(self.bound) + ").")